@@ -1,3 +1 @@
-from rich import traceback
-
-traceback.install()
+"A nonogram bot in Python"
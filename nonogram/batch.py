@@ -0,0 +1,220 @@
+"Solving many Nonogram games in parallel"
+
+import os
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from multiprocessing.util import Finalize
+
+from nonogram import formats
+from nonogram.corpus import NonogramCorpus, iscorpus
+from nonogram.game import NonogramGame
+from nonogram.grids import SharedGrid
+from nonogram.solver.cache import NonogramLineCache, linecache
+
+
+# Loading
+
+def iterpuzzles(paths, fmt=None, errors=False):
+    """Iterate over all puzzles in files and directories of puzzle files
+    The format is detected by the file extension unless `fmt` is given.
+    Binary corpus files (see `nonogram.corpus`) are detected by their extension.
+    With `errors`, broken puzzles and corpus files are yielded with the
+    exception instead of the game data (see `nonogram.formats`).
+    Output format: (name, gamedata)"""
+    for path in paths:
+        if os.path.isdir(path):
+            for filename in sorted(os.listdir(path)):
+                if fmt or iscorpus(filename) or os.path.splitext(filename)[1].lower() in formats.extensions:
+                    yield from iterpuzzles([os.path.join(path, filename)], fmt, errors)
+            continue
+        if fmt is None and iscorpus(path):
+            try:
+                corpus = NonogramCorpus(path)
+            except ValueError as exc:
+                if not errors:
+                    raise
+                yield path, exc
+                continue
+            with corpus:
+                for number, data in enumerate(corpus, start=1):
+                    yield f"{path}:{number}", data
+            continue
+        for number, data in enumerate(formats.readfile(path, fmt, errors), start=1):
+            yield f"{path}:{number}", data
+
+
+def iterstream(stream, fmt="jsonl", name="stdin", errors=False):
+    """Iterate over all puzzles in a stream
+    With `errors`, broken puzzles are yielded with the exception instead of the game data.
+    Output format: (name, gamedata)"""
+    for number, data in enumerate(formats.readers[fmt](stream, errors), start=1):
+        yield f"{name}:{number}", data
+
+
+# Line cache
+
+def initworker(cachefile=None, savedir=None):
+    """Load the line cache of a worker from a file if it exists (runs in a worker process)
+    With `savedir`, the cache is saved there when the worker exits (see `mergecache`)."""
+    if cachefile and os.path.exists(cachefile):
+        linecache.load(cachefile)
+    if savedir:
+        Finalize(None, linecache.save, args=(os.path.join(savedir, f"{os.getpid()}.json"),),
+                 exitpriority=0)
+
+
+def getsavedir(cachefile):
+    "Get a new directory for the workers to save their line caches in (None without a cache file)"
+    return tempfile.mkdtemp(prefix="nonogram-cache-") if cachefile else None
+
+
+def mergecache(cachefile, savedir):
+    """Merge the line caches saved by the workers into the cache file
+    The saved caches and their directory are removed afterwards."""
+    cache = NonogramLineCache(maxsize=linecache.maxsize)
+    if os.path.exists(cachefile):
+        cache.load(cachefile)
+    for filename in sorted(os.listdir(savedir)):
+        path = os.path.join(savedir, filename)
+        cache.load(path)
+        os.remove(path)
+    os.rmdir(savedir)
+    cache.save(cachefile)
+
+
+# Solving
+
+def geterror(name, exc, seconds=0):
+    """Get the result of a puzzle which couldn't be solved because of an exception
+    Output format: {"name", "solved", "seconds", "error"}"""
+    return {
+        'name': name,
+        'solved': False,
+        'seconds': round(seconds, 6),
+        'error': f"{type(exc).__name__}: {exc}",
+    }
+
+
+def solvepuzzle(name, data, mode="logic", timeout=None, shared=False):
+    """Solve a single puzzle and report errors instead of raising them
+
+    With `shared`, data is the name of a game shared with `NonogramGame.toshared`.
+    It is solved in place and the board isn't included in the result.
+    Output format: {"name", "solved", "seconds", "error", **game.export()}"""
+    start = time.perf_counter()
+    game = None
+    try:
+        game = NonogramGame.fromshared(data) if shared else NonogramGame(**data)
+        solved = game.solve(mode=mode, timelimit=timeout) if mode == "search" \
+            else game.solve(mode=mode)
+    except Exception as exc:  # Report broken puzzles instead of stopping the batch
+        result = geterror(name, exc, time.perf_counter()-start)
+    else:
+        result = {
+            'name': name,
+            'solved': solved,
+            'seconds': round(time.perf_counter()-start, 6),
+            'error': None,
+        }
+    if shared:
+        if game is not None:
+            game.grid.close()
+    elif game is not None:
+        result.update(game.export())
+    return result
+
+
+def solvechunk(chunk, mode="logic", timeout=None, shared=False):
+    "Solve a list of puzzles (runs in a worker process)"
+    return [solvepuzzle(name, data, mode, timeout, shared) for name, data in chunk]
+
+
+def _sharechunk(chunk):
+    """Helper function: Copy the puzzles of a chunk into shared memory
+    The requirements are validated by the workers, puzzles with boards of the
+    wrong size or data which can't be stored are reported right away.
+    Output format: ([(name, data, grid), ...], [result, ...])"""
+    grids = []
+    failed = []
+    for name, data in chunk:
+        try:
+            board, xinfo, yinfo = data['board'], data['xinfo'], data['yinfo']
+            if len(board) != len(xinfo) or any(len(row) != len(yinfo) for row in board):
+                raise ValueError("Invalid board!")
+            grids.append((name, data, SharedGrid(board, clues=(xinfo, yinfo))))
+        except Exception as exc:  # Report broken puzzles instead of stopping the batch
+            failed.append(geterror(name, exc))
+    return grids, failed
+
+
+def solvebatch(puzzles, workers=None, chunksize=16, mode="logic", timeout=None, shared=False,
+               cache=None):
+    """Solve puzzles in a process pool and yield the results as they finish
+
+    Puzzles are sent to the workers in chunks of `chunksize`. Only a few chunks
+    per worker are in flight at once, so `puzzles` can be an endless stream.
+    `timeout` is the time limit per puzzle in seconds (only used in search mode).
+    With `shared`, boards are handed to the workers in shared memory instead of
+    being pickled and the solved boards are read from it directly.
+    With `cache`, the workers start with the line cache saved in this file and
+    their caches are merged into it once the batch is done.
+
+    Puzzles given as an exception (see `iterpuzzles`) are reported right away.
+    If a worker process dies, the puzzles of its pool's unfinished chunks are
+    reported with an error and the remaining puzzles are solved in a new pool."""
+    puzzles = iter(puzzles)
+    workers = workers or os.cpu_count() or 1
+    maxpending = 2*workers
+    savedir = getsavedir(cache)
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=initworker,
+                                   initargs=(cache, savedir))
+    broken = False
+    # Names and shared grids by future, the grids are freed once their results are read
+    pending = {}
+    try:
+        while True:
+            while len(pending) < maxpending:
+                chunk = list(islice(puzzles, chunksize))
+                if not chunk:
+                    break
+                yield from (geterror(name, data) for name, data in chunk if isinstance(data, Exception))
+                chunk = [(name, data) for name, data in chunk if not isinstance(data, Exception)]
+                if broken:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    executor = ProcessPoolExecutor(max_workers=workers, initializer=initworker,
+                                                   initargs=(cache, savedir))
+                    broken = False
+                if shared:
+                    grids, failed = _sharechunk(chunk)
+                    yield from failed
+                    chunk = [(name, grid.name) for name, _, grid in grids]
+                    future = executor.submit(solvechunk, chunk, mode, timeout, True)
+                else:
+                    grids = None
+                    future = executor.submit(solvechunk, chunk, mode, timeout)
+                pending[future] = ([name for name, _ in chunk], grids)
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                names, grids = pending.pop(future)
+                try:
+                    results = future.result()
+                except BrokenProcessPool as exc:
+                    results = [geterror(name, exc) for name in names]
+                    broken = True
+                if grids is not None:
+                    for result, (_, data, grid) in zip(results, grids):
+                        result.update(xinfo=data['xinfo'], yinfo=data['yinfo'], board=grid.tolist())
+                        grid.close()
+                yield from results
+    finally:
+        for _, grids in pending.values():
+            for _, _, grid in grids or ():
+                grid.close()
+        executor.shutdown(cancel_futures=True)
+        if savedir:
+            mergecache(cache, savedir)
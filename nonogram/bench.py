@@ -0,0 +1,210 @@
+"Benchmarks for the Nonogram solver"
+
+import json
+import math
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from nonogram.game import NonogramGame
+from nonogram.generator import generate
+from nonogram.solver import NonogramLineSolver, NonogramSolverStats, linecache
+from nonogram.examples import all_examples
+
+SIZES = (10, 25, 50, 100, 200)
+DENSITIES = (0.3, 0.5, 0.7)
+# Lengths of the stalled lines (see `stalledline`) and the time a line may take at most
+LINESIZES = (300, 500, 1000)
+LINELIMIT = 0.05
+# Modules whose import time is measured: the CLI entry point and the solver core
+IMPORTS = {
+    "cli": "nonogram.commands",
+    "game": "nonogram.game",
+    "solver": "nonogram.solver",
+}
+
+_IMPORTSCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps([time.perf_counter()-start, sorted(sys.modules)]))
+"""
+
+
+# Helpers
+
+def percentile(samples, percent):
+    "Get the nearest-rank percentile of a list of numbers"
+    ordered = sorted(samples)
+    rank = max(math.ceil(percent/100*len(ordered)), 1)
+    return ordered[rank-1]
+
+
+def summarize(samples):
+    "Get the median and 95th percentile of a list of timings"
+    return {
+        'median': percentile(samples, 50),
+        'p95': percentile(samples, 95),
+    }
+
+
+def synthetic(width, height, density, seed):
+    "Get the game data of a puzzle created from a random image"
+    return generate(width, height, density, seed)[0]
+
+
+def stalledline(length):
+    """Get a mid-solve line whose blocks all have to be pulled to its end
+    A filled field every 4th field from the right end and length/8 blocks of 1.
+    Output format: (values, requirements)"""
+    count = length//8
+    values = [None]*length
+    for i in range(count):
+        values[length-1-4*i] = True
+    return values, [1]*count
+
+
+# Measuring
+
+def measure(data, repeats=5, backend="list"):
+    "Measure solving a puzzle with the given board backend and all of its lines"
+
+    boardtimes = []
+    linetimes = []
+    solved = False
+    for _ in range(repeats):
+        linecache.clear()
+        game = NonogramGame(**data, backend=backend)
+        start = time.perf_counter()
+        solved = game.solve()
+        boardtimes.append(time.perf_counter()-start)
+
+        lines = [(row, req) for row, req in zip(data['board'], data['xinfo'])] + \
+            [([row[x] for row in data['board']], req) for x, req in enumerate(data['yinfo'])]
+        start = time.perf_counter()
+        for values, requirements in lines:
+            NonogramLineSolver.solve(list(values), requirements)
+        linetimes.append((time.perf_counter()-start)/len(lines))
+
+    # Statistics and memory are measured separately as they slow down solving
+    linecache.clear()
+    stats = NonogramSolverStats()
+    NonogramGame(**data, backend=backend).solve(stats=stats)
+
+    linecache.clear()
+    game = NonogramGame(**data, backend=backend)
+    tracemalloc.start()
+    game.solve()
+    peakmemory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'width': len(data['yinfo']),
+        'height': len(data['xinfo']),
+        'backend': backend,
+        'solved': solved,
+        'solve': summarize(boardtimes),
+        'line': summarize(linetimes),
+        'linecalls': stats.totallinecalls,
+        'stats': stats.export(),
+        'peakmemory': peakmemory,
+    }
+
+
+def measureimport(module, repeats=5):
+    """Measure importing a module in fresh interpreters
+    Also reports whether rich, click or the examples got imported with it."""
+
+    times = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", _IMPORTSCRIPT.format(module=module)],
+                                check=True, capture_output=True, text=True).stdout
+        seconds, modules = json.loads(output)
+        times.append(seconds)
+    return {
+        'module': module,
+        'import': summarize(times),
+        'loaded': [name for name in ("rich", "click", "numpy", "nonogram.examples") if name in modules],
+    }
+
+
+def measureline(values, requirements, repeats=5):
+    "Measure solving a single line with NonogramLineSolver (without the cache)"
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        NonogramLineSolver.solve(list(values), requirements)
+        times.append(time.perf_counter()-start)
+    return {
+        'width': len(values),
+        'line': summarize(times),
+        'limit': LINELIMIT,
+    }
+
+
+def runlines(sizes=LINESIZES, repeats=5):
+    """Measure solving stalled lines of large boards and yield the results
+    Output format: (name, result)"""
+    for size in sizes:
+        yield f"line/{size}", measureline(*stalledline(size), repeats)
+
+
+def runimports(imports=IMPORTS, repeats=5):
+    """Measure the import times and yield the results
+    Output format: (name, result)"""
+    for name, module in imports.items():
+        yield f"import/{name}", measureimport(module, repeats)
+
+
+def run(sizes=SIZES, densities=DENSITIES, repeats=5, seed=0, examples=True, backend="list"):
+    """Run all benchmarks with the given board backend and yield the results
+    Output format: (name, result)"""
+
+    if examples:
+        for name, (_, _, data) in all_examples.items():
+            yield f"example/{name}", measure(data, repeats, backend)
+
+    for size in sizes:
+        for density in densities:
+            data = synthetic(size, size, density, seed)
+            result = measure(data, repeats, backend)
+            result['density'] = density
+            yield f"synthetic/{size}x{size}/{density}", result
+
+
+def getreport(results, imports=(), lines=(), backend="list"):
+    "Get a JSON serializable report of benchmark, import and line time results"
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'backend': backend,
+        'results': dict(results),
+        'imports': dict(imports),
+        'lines': dict(lines),
+    }
+
+
+def compare(report, baseline):
+    """Compare the median solving, import and line times of two reports
+    Raises ValueError if the boards were solved with different backends
+    (reports without a backend were made with lists).
+    Output format: {name: new/old, ...} for all benchmarks in both reports"""
+    if report.get('backend', "list") != baseline.get('backend', "list"):
+        raise ValueError(f"Can't compare the {report.get('backend', 'list')} backend "
+                         f"with a baseline of the {baseline.get('backend', 'list')} backend")
+    ratios = {}
+    for name, result in report['results'].items():
+        old = baseline['results'].get(name)
+        if old and old['solve']['median']:
+            ratios[name] = result['solve']['median']/old['solve']['median']
+    for name, result in report.get('imports', {}).items():
+        old = baseline.get('imports', {}).get(name)
+        if old and old['import']['median']:
+            ratios[name] = result['import']['median']/old['import']['median']
+    for name, result in report.get('lines', {}).items():
+        old = baseline.get('lines', {}).get(name)
+        if old and old['line']['median']:
+            ratios[name] = result['line']['median']/old['line']['median']
+    return ratios
@@ -1,14 +1,25 @@
-"Nonogram CLI"
+"""Nonogram CLI
+
+Commands import the solver, the examples and rich only when they run, so
+that starting the CLI stays fast."""
+
+import json
+import sys
 
 import click
 
-from rich import print
-from rich.table import Table
-from rich.rule import Rule
+from nonogram.utils import DEBUG, OFF, log, rule, setting, tracing
+
+
+def _excepthook(*args):
+    "Helper function: Show uncaught exceptions with rich, which is only imported if one occurs"
+    from rich import traceback
 
-from nonogram.utils import log, setting
-from nonogram.game import NonogramGame
-from nonogram.examples import all_examples
+    traceback.install()
+    sys.excepthook(*args)
+
+
+sys.excepthook = _excepthook
 
 
 @click.group()
@@ -31,32 +42,60 @@ def main():
 @main.command()
 @click.argument('name')
 @click.option('--verbose', '-v', default=False, help='Activate verbose output', is_flag=True)
-def run_test(name, verbose=False):
+@click.option('--mode', '-m', default='logic', help='Solving mode', type=click.Choice(['logic', 'probe', 'search']))
+@click.option('--events', '-e', default=None, type=click.File('w'), help='Write solver events as JSON lines to a file')
+@click.option('--stats', '-s', 'showstats', default=False, help='Show solver statistics', is_flag=True)
+@click.option('--workers', '-w', default=None, type=int, help='Solve the lines on this many processes (logic and probe modes)')
+@click.option('--corpus', '-c', 'corpora', multiple=True, type=click.Path(exists=True, dir_okay=False),
+              help='Also draw examples from a puzzle corpus (named "<file name>:<number>")')
+def run_test(name, verbose=False, mode='logic', events=None, showstats=False, workers=None, corpora=()):
     "Test the solver for one example"
 
+    from nonogram.examples import all_examples
+    from nonogram.game import NonogramGame
+    from nonogram.solver import NonogramSolverStats
+
+    for path in corpora:
+        all_examples.addcorpus(path)
+
     setting('debug', verbose)
+    if events:
+        tracing.configure(DEBUG if verbose else OFF, events)
 
     if not name in all_examples:
         log(f"Example {name} not found!")
         return
 
-    log(Rule(f"Running test ({name})"))
+    log(rule(f"Running test ({name})"))
 
     example = all_examples[name][2]
     game = NonogramGame(**example)
-    result = game.solve()
+    stats = NonogramSolverStats() if showstats else None
+    result = game.solve(mode=mode, stats=stats, workers=workers)
+    if stats is not None:
+        log(stats.export())
 
     if result:
-        log(Rule("Test succeeded"))
+        log(rule("Test succeeded"))
     else:
-        log(Rule("Test failed"))
+        log(rule("Test failed"))
 
 
 @main.command()
-def run_tests():
+@click.option('--corpus', '-c', 'corpora', multiple=True, type=click.Path(exists=True, dir_okay=False),
+              help='Also test the puzzles of a puzzle corpus')
+def run_tests(corpora=()):
     "Test the solver module for all examples"
 
-    log(Rule(f"Running tests ({len(all_examples)})"))
+    from rich.table import Table
+
+    from nonogram.examples import all_examples
+    from nonogram.game import NonogramGame
+
+    for path in corpora:
+        all_examples.addcorpus(path)
+
+    log(rule(f"Running tests ({len(all_examples)})"))
 
     tab = Table("Category", "Nr.", "Status", title="Test results")
 
@@ -65,4 +104,248 @@ def run_tests():
         result = game.solve()
         tab.add_row(category, str(num), "✅" if result else "❌")
 
-    log(tab, Rule("Tests ended"))
+    log(tab, rule("Tests ended"))
+
+
+@main.command()
+@click.argument('paths', nargs=-1, type=click.Path(exists=True))
+@click.option('--workers', '-w', default=None, type=int, help='Number of worker processes (default: CPU count)')
+@click.option('--chunksize', '-c', default=16, show_default=True, help='Puzzles per task sent to a worker')
+@click.option('--mode', '-m', default='logic', help='Solving mode', type=click.Choice(['logic', 'probe', 'search']))
+@click.option('--timeout', '-t', default=None, type=float, help='Time limit per puzzle in seconds (only in search mode)')
+@click.option('--format', '-f', 'fmt', default=None, type=click.Choice(['non', 'g', 'jsonl', 'json']),
+              help='Puzzle format (default: by file extension, jsonl for stdin)')
+@click.option('--output', '-o', default=None, type=click.Path(dir_okay=False),
+              help='Also write the solved boards to a file (format by extension, broken puzzles are skipped)')
+@click.option('--shared', default=False, is_flag=True, help='Hand boards to the workers in shared memory instead of pickling them')
+@click.option('--cache', default=None, type=click.Path(dir_okay=False),
+              help='Load the line cache from this file and save it there afterwards')
+def solve_batch(paths, workers=None, chunksize=16, mode='logic', timeout=None, fmt=None, output=None, shared=False,
+                cache=None):
+    """Solve many puzzles in parallel
+
+    PATHS are puzzle files (NON, Olsak .g, JSON lines or JSON) or directories
+    of puzzle files. Without PATHS, puzzles are read from stdin.
+    Results are written as JSON lines in the order they finish."""
+
+    if timeout is not None and mode != 'search':
+        raise click.UsageError("--timeout can only be used in search mode")
+
+    from nonogram import formats
+    from nonogram.batch import iterpuzzles, iterstream, solvebatch
+
+    puzzles = iterpuzzles(paths, fmt, errors=True) if paths else \
+        iterstream(sys.stdin, fmt or 'jsonl', errors=True)
+    results = solvebatch(puzzles, workers=workers, chunksize=chunksize, mode=mode, timeout=timeout, shared=shared,
+                         cache=cache)
+
+    def solved():
+        for result in results:
+            click.echo(json.dumps(result))
+            yield result
+
+    if output:
+        # Puzzles which couldn't be built have no game data to write
+        formats.writefile(output, (result for result in solved() if 'xinfo' in result))
+    else:
+        for _ in solved():
+            pass
+
+
+@main.command()
+@click.argument('output', type=click.Path(dir_okay=False))
+@click.argument('paths', nargs=-1, type=click.Path(exists=True))
+@click.option('--format', '-f', 'fmt', default=None, type=click.Choice(['non', 'g', 'jsonl', 'json']),
+              help='Puzzle format (default: by file extension, jsonl for stdin)')
+@click.option('--solve', default=False, is_flag=True, help='Store the solutions of puzzles solvable by line logic')
+def build_corpus(output, paths, fmt=None, solve=False):
+    """Write puzzles into a binary corpus file
+
+    PATHS are puzzle files or directories like for solve-batch, without PATHS
+    puzzles are read from stdin. Fully known boards are stored as solutions."""
+
+    from nonogram.batch import iterpuzzles, iterstream
+    from nonogram.corpus import writecorpus
+
+    puzzles = iterpuzzles(paths, fmt) if paths else iterstream(sys.stdin, fmt or 'jsonl')
+    if solve:
+        from nonogram.game import NonogramGame
+
+        def solved(puzzles):
+            for name, data in puzzles:
+                game = NonogramGame(**data)
+                yield name, {**data, 'solution': game.rows if game.solve() else None}
+
+        puzzles = solved(puzzles)
+
+    written = writecorpus(output, puzzles)
+    log(f"{written} puzzles written to {output}")
+
+
+@main.command()
+@click.option('--host', default='127.0.0.1', show_default=True, help='Address to listen on with --port')
+@click.option('--port', '-p', default=None, type=int, help='Listen on TCP instead of stdin/stdout')
+@click.option('--workers', '-w', default=None, type=int, help='Number of worker processes (default: CPU count)')
+@click.option('--chunksize', '-c', default=4, show_default=True, help='Maximal requests per task sent to a worker')
+@click.option('--maxqueue', default=1000, show_default=True, help='Maximal waiting requests before rejecting new ones')
+@click.option('--mode', '-m', default='logic', help='Default solving mode', type=click.Choice(['logic', 'probe', 'search']))
+@click.option('--timeout', '-t', default=None, type=float, help='Default deadline per request in seconds')
+@click.option('--cache', default=None, type=click.Path(dir_okay=False),
+              help='Load the line cache from this file and save it there when stopping')
+def serve(host, port=None, workers=None, chunksize=4, maxqueue=1000, mode='logic', timeout=None, cache=None):
+    """Run a solving service
+
+    Requests are JSON lines with the game data and optionally an "id",
+    "mode" and "timeout", or {"cancel": id} to cancel a request. Every
+    request is answered with a JSON line containing its id, the result and
+    the solved board. Without --port, requests are read from stdin and
+    answered on stdout."""
+
+    import asyncio
+
+    from nonogram.server import serve as runserver
+
+    try:
+        asyncio.run(runserver(host, port, workers=workers, chunksize=chunksize,
+                              maxqueue=maxqueue, mode=mode, timeout=timeout, cache=cache))
+    except KeyboardInterrupt:
+        pass
+
+
+@main.command()
+@click.option('--sizes', '-s', default='10,25,50,100,200', show_default=True, help='Comma separated board sizes')
+@click.option('--densities', '-d', default='0.3,0.5,0.7', show_default=True, help='Comma separated fill densities')
+@click.option('--repeats', '-r', default=5, show_default=True, help='Runs per benchmark')
+@click.option('--seed', default=0, show_default=True, help='Seed for the synthetic puzzles')
+@click.option('--output', '-o', default=None, type=click.Path(), help='Write the results to a JSON file')
+@click.option('--compare', '-c', 'baseline', default=None, type=click.Path(exists=True),
+              help='Compare with the results of an earlier run')
+@click.option('--threshold', default=1.2, show_default=True, help='Slowdown ratio reported as regression')
+@click.option('--backend', '-b', default='list', show_default=True, help='Board backend',
+              type=click.Choice(['list', 'bits', 'numpy']))
+def bench(sizes, densities, repeats, seed, output=None, baseline=None, threshold=1.2, backend='list'):
+    """Benchmark the solver on the examples and on synthetic puzzles and measure import times
+
+    Stalled lines of large boards are timed as well, lines taking longer than
+    the limit are reported as too slow."""
+
+    from rich.table import Table, Column
+
+    from nonogram import bench as benchmarks
+
+    sizes = [int(size) for size in sizes.split(',') if size]
+    densities = [float(density) for density in densities.split(',') if density]
+
+    if baseline:
+        with open(baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        if baseline.get('backend', 'list') != backend:
+            raise click.UsageError(f"The baseline was measured with the {baseline.get('backend', 'list')} "
+                                   f"backend, use --backend {baseline.get('backend', 'list')}")
+
+    tab = Table(Column("Benchmark", no_wrap=True), "Solved", "Median", "P95", "Line median", "Line calls", "Peak memory",
+                title=f"Benchmark results ({backend} backend)")
+    results = []
+    for name, result in benchmarks.run(sizes, densities, repeats, seed, backend=backend):
+        results.append((name, result))
+        tab.add_row(
+            name,
+            "✅" if result['solved'] else "❌",
+            f"{result['solve']['median']*1000:.2f} ms",
+            f"{result['solve']['p95']*1000:.2f} ms",
+            f"{result['line']['median']*1e6:.1f} µs",
+            str(result['linecalls']),
+            f"{result['peakmemory']/1024:.0f} KiB",
+        )
+    log(tab)
+
+    tab = Table(Column("Import", no_wrap=True), "Module", "Median", "P95", "Also imports", title="Import times")
+    imports = []
+    for name, result in benchmarks.runimports(repeats=repeats):
+        imports.append((name, result))
+        tab.add_row(
+            name,
+            result['module'],
+            f"{result['import']['median']*1000:.2f} ms",
+            f"{result['import']['p95']*1000:.2f} ms",
+            ", ".join(result['loaded']) or "-",
+        )
+    log(tab)
+
+    tab = Table(Column("Line", no_wrap=True), "Width", "Median", "P95", "Limit", title="Line times")
+    lines = []
+    for name, result in benchmarks.runlines(repeats=repeats):
+        lines.append((name, result))
+        tab.add_row(
+            name,
+            str(result['width']),
+            f"{result['line']['median']*1000:.2f} ms",
+            f"{result['line']['p95']*1000:.2f} ms",
+            "✅" if result['line']['median'] <= result['limit'] else "❌",
+        )
+    log(tab)
+    for name, result in lines:
+        if result['line']['median'] > result['limit']:
+            log(f"[red]Too slow:[/] {name} takes {result['line']['median']*1000:.2f} ms "
+                f"(limit: {result['limit']*1000:.0f} ms)")
+
+    report = benchmarks.getreport(results, imports, lines, backend=backend)
+    if output:
+        with open(output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        log(f"Results written to {output}")
+
+    if baseline:
+        ratios = benchmarks.compare(report, baseline)
+        regressions = {name: ratio for name, ratio in ratios.items() if ratio > threshold}
+        for name, ratio in regressions.items():
+            log(f"[red]Regression:[/] {name} is {ratio:.2f}x slower")
+        if not regressions:
+            log(f"[green]No regressions[/] ({len(ratios)} benchmarks compared)")
+
+
+@main.command()
+@click.argument('count', type=int)
+@click.option('--width', '-w', default=10, show_default=True, help='Board width')
+@click.option('--height', '-h', default=None, type=int, help='Board height (default: width)')
+@click.option('--density', '-d', default=0.5, show_default=True, help='Probability of a field being filled')
+@click.option('--seed', '-s', default=0, show_default=True, help='Seed of the first puzzle')
+@click.option('--unique', '-u', default=False, is_flag=True, help='Only keep puzzles with exactly one solution')
+@click.option('--solution', default=False, is_flag=True, help='Include the solution in the output')
+@click.option('--output', '-o', default=None, type=click.Path(file_okay=False),
+              help='Write one JSON file per puzzle into this directory')
+@click.option('--corpus', default=None, type=click.Path(dir_okay=False),
+              help='Write all puzzles into a binary corpus file (.nonc)')
+def generate(count, width, height=None, density=0.5, seed=0, unique=False, solution=False, output=None,
+             corpus=None):
+    """Generate random puzzles
+
+    Puzzles are written as JSON lines to stdout, as JSON files into a
+    directory or into a corpus file and can be solved with solve-batch."""
+
+    import os
+
+    from nonogram.generator import generatemany
+
+    if corpus:
+        from nonogram.corpus import writecorpus
+
+        puzzles = generatemany(count, width, height or width, density, seed, unique)
+        written = writecorpus(corpus, (
+            (f"{width}x{height or width}-{puzzleseed}", {**data, 'solution': image if solution else None})
+            for puzzleseed, data, image in puzzles
+        ))
+        log(f"{written} puzzles written to {corpus}", file=sys.stderr)
+        return
+
+    if output:
+        os.makedirs(output, exist_ok=True)
+    for puzzleseed, data, image in generatemany(count, width, height or width, density, seed, unique):
+        if solution:
+            data['solution'] = image
+        if output:
+            path = os.path.join(output, f"{width}x{height or width}-{puzzleseed}.json")
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump(data, file)
+        else:
+            click.echo(json.dumps(data))
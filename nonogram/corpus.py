@@ -0,0 +1,224 @@
+"""Compact binary corpus of Nonogram puzzles with random access
+
+A corpus file is read through mmap: opening it only reads the header, and a
+puzzle is only decoded once it is accessed by its id (0 to len-1).
+
+File layout (all integers little endian):
+- Header: magic b"NONOCRPS", version (uint32), 0 (uint32), puzzle count
+  (uint64) and the offset of the index (uint64)
+- Records: width, height and flags as varints, the name (if flag 2 is set) as
+  varint length and UTF-8 bytes, the clues of all rows and then all columns as
+  block count followed by the blocks (varints) and the solution (if flag 1
+  is set) as bitmap of width*height bits, row by row, lowest bit first
+- Index: the offset of every record (uint64)"""
+
+import mmap
+import os
+import struct
+
+from nonogram.formats import getgamedata
+
+MAGIC = b"NONOCRPS"
+VERSION = 1
+EXTENSION = ".nonc"
+
+_HEADER = struct.Struct("<8sIIQQ")
+_OFFSET = struct.Struct("<Q")
+
+FLAG_SOLUTION = 1
+FLAG_NAME = 2
+
+
+# Encoding
+
+def _writevarint(buffer, value):
+    "Helper function: Append an unsigned int as varint (7 bits per byte)"
+    while value >= 0x80:
+        buffer.append(value & 0x7f | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _readvarint(data, pos):
+    """Helper function: Read a varint
+    Output format: (value, newpos)"""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def encodepuzzle(data, name=None, solution=None):
+    "Get the record of a puzzle as bytes"
+    xinfo, yinfo = data['xinfo'], data['yinfo']
+    width, height = len(yinfo), len(xinfo)
+    buffer = bytearray()
+    _writevarint(buffer, width)
+    _writevarint(buffer, height)
+    _writevarint(buffer, (FLAG_SOLUTION if solution is not None else 0) | (FLAG_NAME if name else 0))
+    if name:
+        encoded = name.encode('utf-8')
+        _writevarint(buffer, len(encoded))
+        buffer += encoded
+    for requirements in (*xinfo, *yinfo):
+        _writevarint(buffer, len(requirements))
+        for req in requirements:
+            _writevarint(buffer, req)
+    if solution is not None:
+        bits = bytearray((width*height+7)//8)
+        for y, row in enumerate(solution):
+            for x, value in enumerate(row):
+                if value:
+                    i = y*width+x
+                    bits[i >> 3] |= 1 << (i & 7)
+        buffer += bits
+    return bytes(buffer)
+
+
+def getsolution(data):
+    "Get the solution of game data: its 'solution' or its board if fully known, else None"
+    if data.get('solution') is not None:
+        return data['solution']
+    board = data.get('board')
+    if board and all(None not in row for row in board):
+        return board
+    return None
+
+
+def writecorpus(path, puzzles):
+    """Write puzzles to a corpus file, one at a time
+    `puzzles` yields (name, gamedata) where name may be None. Solutions are
+    stored if the data has a 'solution' or a fully known board.
+    Returns the number of puzzles written."""
+    offsets = []
+    with open(path, 'wb') as file:
+        file.write(bytes(_HEADER.size))
+        pos = _HEADER.size
+        for name, data in puzzles:
+            record = encodepuzzle(data, name, getsolution(data))
+            offsets.append(pos)
+            file.write(record)
+            pos += len(record)
+        for offset in offsets:
+            file.write(_OFFSET.pack(offset))
+        file.seek(0)
+        file.write(_HEADER.pack(MAGIC, VERSION, 0, len(offsets), pos))
+    return len(offsets)
+
+
+# Reading
+
+class NonogramCorpus():
+    """Read-only puzzle corpus backed by mmap
+
+    corpus[id] decodes the game data of a puzzle, `getgame` builds a game.
+    Nothing is cached: decoding a puzzle only reads its own record."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty files can't be mapped
+            self._file.close()
+            raise ValueError(f"Not a Nonogram corpus: {path}")
+        if len(self._data) < _HEADER.size:
+            self.close()
+            raise ValueError(f"Not a Nonogram corpus: {path}")
+        magic, version, _, self._count, self._index = _HEADER.unpack_from(self._data)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"Not a Nonogram corpus (or unsupported version): {path}")
+        if self._index < _HEADER.size or self._index+_OFFSET.size*self._count > len(self._data):
+            self.close()
+            raise ValueError(f"Not a Nonogram corpus (truncated): {path}")
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, puzzleid):
+        "Get the game data of a puzzle with an empty board"
+        record = self.getrecord(puzzleid)
+        return getgamedata(record['xinfo'], record['yinfo'])
+
+    def __iter__(self):
+        for puzzleid in range(self._count):
+            yield self[puzzleid]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        "Close the file"
+        if self._data is not None:
+            self._data.close()
+            self._file.close()
+            self._data = None
+
+    def getrecord(self, puzzleid):
+        """Decode the record of a puzzle
+        Output format: {"name", "xinfo", "yinfo", "solution"} (name and solution may be None)"""
+        if not 0 <= puzzleid < self._count:
+            raise IndexError('Puzzle id out of range')
+        data = self._data
+        pos = _OFFSET.unpack_from(data, self._index+_OFFSET.size*puzzleid)[0]
+        width, pos = _readvarint(data, pos)
+        height, pos = _readvarint(data, pos)
+        flags, pos = _readvarint(data, pos)
+
+        name = None
+        if flags & FLAG_NAME:
+            length, pos = _readvarint(data, pos)
+            name = data[pos:pos+length].decode('utf-8')
+            pos += length
+
+        clues = []
+        for _ in range(height+width):
+            count, pos = _readvarint(data, pos)
+            requirements = []
+            for _ in range(count):
+                req, pos = _readvarint(data, pos)
+                requirements.append(req)
+            clues.append(tuple(requirements))
+
+        solution = None
+        if flags & FLAG_SOLUTION:
+            bits = data[pos:pos+(width*height+7)//8]
+            solution = [
+                [bool(bits[(y*width+x) >> 3] >> ((y*width+x) & 7) & 1) for x in range(width)]
+                for y in range(height)
+            ]
+
+        return {
+            'name': name,
+            'xinfo': tuple(clues[:height]),
+            'yinfo': tuple(clues[height:]),
+            'solution': solution,
+        }
+
+    def getname(self, puzzleid):
+        "Get the stored name of a puzzle (None if it has none)"
+        return self.getrecord(puzzleid)['name']
+
+    def getsolution(self, puzzleid):
+        "Get the stored solution of a puzzle as rows of True/False (None if it has none)"
+        return self.getrecord(puzzleid)['solution']
+
+    def getgame(self, puzzleid, backend="list"):
+        "Get a new game of a puzzle with an empty board"
+        from nonogram.game import NonogramGame
+
+        return NonogramGame(**self[puzzleid], backend=backend)
+
+
+def iscorpus(path):
+    "Check if a file is a corpus by its extension"
+    return os.path.splitext(path)[1].lower() == EXTENSION
@@ -1,4 +1,13 @@
-"Example nonogram games for testing"
+"""Example nonogram games for testing
+
+Besides the built-in examples, `all_examples` can draw from puzzle corpora
+(see `nonogram.corpus`), added with `all_examples.addcorpus(path)` or listed
+in the NONOGRAM_CORPUS environment variable (separated by os.pathsep).
+Corpus puzzles are named "<file name>:<number>" and only decoded on access."""
+
+import os
+import sys
+from collections.abc import Mapping
 
 from .easy1 import gamedata as easy1
 from .easy2 import gamedata as easy2
@@ -9,7 +18,46 @@ from .hard1 import gamedata as hard1
 
 from .expert1 import gamedata as expert1
 
-all_examples = {
+
+class NonogramExamples(Mapping):
+    """Examples by name
+    Output format: {name: (category, number, gamedata), ...}"""
+
+    def __init__(self, examples):
+        self._examples = examples
+        # Corpora by name: (category, corpus)
+        self._corpora = {}
+
+    def addcorpus(self, path, category=None):
+        "Add the puzzles of a corpus file, the category defaults to the file name"
+        from nonogram.corpus import NonogramCorpus
+
+        name = os.path.splitext(os.path.basename(path))[0]
+        self._corpora[name] = (category or name, NonogramCorpus(path))
+        return name
+
+    def __getitem__(self, name):
+        if name in self._examples:
+            return self._examples[name]
+        corpusname, _, number = name.rpartition(':')
+        if corpusname in self._corpora and number.isdigit():
+            category, corpus = self._corpora[corpusname]
+            number = int(number)
+            if 1 <= number <= len(corpus):
+                return (category, number, corpus[number-1])
+        raise KeyError(name)
+
+    def __iter__(self):
+        yield from self._examples
+        for corpusname, (_, corpus) in self._corpora.items():
+            for number in range(1, len(corpus)+1):
+                yield f"{corpusname}:{number}"
+
+    def __len__(self):
+        return len(self._examples) + sum(len(corpus) for _, corpus in self._corpora.values())
+
+
+all_examples = NonogramExamples({
     "easy1": ("Easy", 1, easy1),
     "easy2": ("Easy", 2, easy2),
 
@@ -18,4 +66,11 @@ all_examples = {
     "hard1": ("Hard", 1, hard1),
 
     "expert1": ("Expert", 1, expert1),
-}
+})
+
+for _path in filter(None, os.environ.get("NONOGRAM_CORPUS", "").split(os.pathsep)):
+    # A bad path shouldn't break importing the built-in examples
+    try:
+        all_examples.addcorpus(_path)
+    except (OSError, ValueError) as _exc:
+        print(f"Skipping NONOGRAM_CORPUS entry {_path!r}: {_exc}", file=sys.stderr)
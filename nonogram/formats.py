@@ -0,0 +1,239 @@
+"""Reading and writing Nonogram puzzles in common file formats
+
+Supported formats:
+- "non": Steve Simpson's NON format (width/height/rows/columns/goal)
+- "g": Olsak's grid format (": rows" and ": columns" sections)
+- "jsonl": One JSON object per line with "xinfo", "yinfo" and optionally "board"
+- "json": One such JSON object or a list of them (read as a whole)
+
+All readers are generators reading one line at a time, so a file can contain
+any number of puzzles without being loaded into memory. Readers yield game
+data which can be used as `NonogramGame(**data)`. With `errors`, a broken
+puzzle is yielded as the exception it raised and reading goes on with the
+next one. Writers take an iterable of game data (e.g. from `NonogramGame.export`)."""
+
+import json
+import os
+
+extensions = {
+    ".non": "non",
+    ".g": "g",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".json": "json",
+}
+
+
+# Helpers
+
+def getgamedata(xinfo, yinfo, board=None):
+    "Get game data with an empty board if none is given"
+    if board is None:
+        board = [[None]*len(yinfo) for _ in xinfo]
+    return {'xinfo': xinfo, 'yinfo': yinfo, 'board': board}
+
+
+def _parseclue(text):
+    "Helper function: Parse a clue like '1,2' or '1 2' where '0' means no block"
+    return [num for num in map(int, text.replace(',', ' ').split()) if num]
+
+
+def _formatclue(requirements, separator):
+    "Helper function: Format a clue where no block is written as '0'"
+    return separator.join(map(str, requirements)) or "0"
+
+
+def _getpuzzle(xinfo, yinfo, broken):
+    "Helper function: Get the game data of a read puzzle or the error which broke it"
+    return broken if broken is not None else getgamedata(xinfo, yinfo)
+
+
+def getformat(path):
+    "Get the format of a file by its extension"
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in extensions:
+        raise ValueError(f"Unknown puzzle format: {path}")
+    return extensions[ext]
+
+
+# NON
+
+def readnon(stream, errors=False):
+    "Read puzzles in NON format; a new puzzle starts with a header after a complete one"
+    xinfo, yinfo = [], []
+    section = None
+    broken = None
+    for line in stream:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        keyword = line.split(None, 1)[0].lower()
+        if keyword in ('rows', 'columns'):
+            if keyword == 'rows' and xinfo and yinfo:
+                yield _getpuzzle(xinfo, yinfo, broken)
+                xinfo, yinfo, broken = [], [], None
+            section = xinfo if keyword == 'rows' else yinfo
+        elif line[0].isdigit() and section is not None:
+            try:
+                section.append(_parseclue(line))
+            except ValueError as exc:
+                if not errors:
+                    raise
+                broken = exc
+        else:
+            # Other keywords (title, width, goal, ...) end a clue section
+            section = None
+            if keyword in ('catalogue', 'title', 'width') and xinfo and yinfo:
+                yield _getpuzzle(xinfo, yinfo, broken)
+                xinfo, yinfo, broken = [], [], None
+    if xinfo or yinfo:
+        yield _getpuzzle(xinfo, yinfo, broken)
+
+
+def writenon(stream, puzzles):
+    "Write puzzles in NON format; fully known boards are written as goal"
+    for number, data in enumerate(puzzles):
+        if number:
+            stream.write("\n")
+        stream.write(f"width {len(data['yinfo'])}\nheight {len(data['xinfo'])}\n\nrows\n")
+        for requirements in data['xinfo']:
+            stream.write(_formatclue(requirements, ",")+"\n")
+        stream.write("\ncolumns\n")
+        for requirements in data['yinfo']:
+            stream.write(_formatclue(requirements, ",")+"\n")
+        board = data.get('board')
+        if board and all(None not in row for row in board):
+            goal = "".join("1" if val else "0" for row in board for val in row)
+            stream.write(f'\ngoal "{goal}"\n')
+
+
+# Olsak
+
+def reado(stream, errors=False):
+    "Read puzzles in Olsak's grid format; a new puzzle starts with each ': rows' section"
+    xinfo, yinfo = [], []
+    section = None
+    broken = None
+    for line in stream:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith(':'):
+            name = line[1:].strip().lower()
+            if name == 'rows':
+                if xinfo or yinfo:
+                    yield _getpuzzle(xinfo, yinfo, broken)
+                    xinfo, yinfo, broken = [], [], None
+                section = xinfo
+            elif name == 'columns':
+                section = yinfo
+            else:
+                section = None
+        elif section is not None:
+            try:
+                section.append(_parseclue(line))
+            except ValueError as exc:
+                if not errors:
+                    raise
+                broken = exc
+    if xinfo or yinfo:
+        yield _getpuzzle(xinfo, yinfo, broken)
+
+
+def writeo(stream, puzzles):
+    "Write puzzles in Olsak's grid format (clues only)"
+    for data in puzzles:
+        stream.write(": rows\n")
+        for requirements in data['xinfo']:
+            stream.write(_formatclue(requirements, " ")+"\n")
+        stream.write(": columns\n")
+        for requirements in data['yinfo']:
+            stream.write(_formatclue(requirements, " ")+"\n")
+
+
+# JSON lines
+
+def _loadpuzzle(data):
+    "Helper function: Get the game data of a parsed JSON object"
+    if not isinstance(data, dict):
+        raise ValueError("Puzzles have to be JSON objects")
+    return getgamedata(data['xinfo'], data['yinfo'], data.get('board'))
+
+
+def readjsonlines(stream, errors=False):
+    "Read puzzles with one JSON object per line"
+    for line in stream:
+        if line.strip():
+            try:
+                data = _loadpuzzle(json.loads(line))
+            except (ValueError, KeyError) as exc:
+                if not errors:
+                    raise
+                data = exc
+            yield data
+
+
+def writejsonlines(stream, puzzles):
+    "Write puzzles with one JSON object per line"
+    for data in puzzles:
+        stream.write(json.dumps(getgamedata(data['xinfo'], data['yinfo'], data.get('board')))+"\n")
+
+
+# JSON
+
+def readjson(stream, errors=False):
+    "Read a JSON file with one puzzle or a list of puzzles"
+    try:
+        data = json.load(stream)
+    except ValueError as exc:
+        if not errors:
+            raise
+        yield exc
+        return
+    for puzzle in data if isinstance(data, list) else [data]:
+        try:
+            puzzle = _loadpuzzle(puzzle)
+        except (ValueError, KeyError) as exc:
+            if not errors:
+                raise
+            puzzle = exc
+        yield puzzle
+
+
+def writejson(stream, puzzles):
+    "Write puzzles as a JSON list"
+    stream.write("[")
+    for number, data in enumerate(puzzles):
+        if number:
+            stream.write(",")
+        stream.write("\n"+json.dumps(getgamedata(data['xinfo'], data['yinfo'], data.get('board'))))
+    stream.write("\n]\n")
+
+
+readers = {
+    "non": readnon,
+    "g": reado,
+    "jsonl": readjsonlines,
+    "json": readjson,
+}
+
+writers = {
+    "non": writenon,
+    "g": writeo,
+    "jsonl": writejsonlines,
+    "json": writejson,
+}
+
+
+# Files
+
+def readfile(path, fmt=None, errors=False):
+    "Read all puzzles from a file, one at a time"
+    with open(path, 'r', encoding='utf-8') as file:
+        yield from readers[fmt or getformat(path)](file, errors)
+
+
+def writefile(path, puzzles, fmt=None):
+    "Write puzzles to a file, one at a time"
+    with open(path, 'w', encoding='utf-8') as file:
+        writers[fmt or getformat(path)](file, puzzles)
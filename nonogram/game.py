@@ -1,39 +1,73 @@
 "A Nonogram game"
 
-import copy
-
-from rich.table import Table, Column
-from rich.rule import Rule
-
-from nonogram.solver import NonogramBoardSolver
-from nonogram.utils import log
-
-
-def _cell(value):
-    "Helper function to represent values of a cell"
-    if value is True:
-        return '⬛'
-    if value is False:
-        return '❌'
-    return None
+from nonogram.grids import SharedGrid, grids
+from nonogram.solver import NonogramBoardSolver, NonogramClue, NonogramHintSolver, NonogramSearchSolver
+from nonogram.solver.board import ROW, COL
+from nonogram.solver.exceptions import UnsolvableState
 
 
 class NonogramGame():
     "A Nonogram game"
 
-    def __init__(self, xinfo, yinfo, board):
+    def __init__(self, xinfo, yinfo, board, backend="list"):
         if len(xinfo) != len(board) or len(yinfo) != len(board[0]):
             raise ValueError("Invalid board!")
-
-        self.__xinfo = copy.deepcopy(xinfo)
-        self.__yinfo = copy.deepcopy(yinfo)
-        self.__board = copy.deepcopy(board)
+        if backend not in grids:
+            raise ValueError(f"Unknown backend: {backend}")
+
+        width = len(yinfo)
+        height = len(xinfo)
+        self.__xinfo = tuple(NonogramClue.get(requirements, width) for requirements in xinfo)
+        self.__yinfo = tuple(NonogramClue.get(requirements, height) for requirements in yinfo)
+        if backend == "shared":
+            # Shared blocks hold the requirements too, so other processes can attach to them
+            self.__grid = SharedGrid(board, clues=(self.__xinfo, self.__yinfo))
+        else:
+            self.__grid = grids[backend](board)
+
+    @classmethod
+    def fromtrusted(cls, xinfo, yinfo, board, backend="list"):
+        """Create a game from data which isn't used anywhere else
+
+        Nothing is validated or copied: xinfo and yinfo have to be tuples of
+        NonogramClue (or tuples) and with the "list" backend the board rows are
+        used directly."""
+        game = cls.__new__(cls)
+        game.__xinfo = xinfo
+        game.__yinfo = yinfo
+        if backend == "shared":
+            game.__grid = SharedGrid(board, copy=False, clues=(xinfo, yinfo))
+        else:
+            game.__grid = grids[backend](board, copy=False)
+        return game
+
+    @classmethod
+    def fromshared(cls, name):
+        """Attach to a game shared by another process with `toshared`
+        The fields are used in place: changes are seen by all attached processes.
+        Raises ValueError if the block holds no requirements."""
+        grid = SharedGrid.attach(name)
+        clues = grid.getclues()
+        if clues is None:
+            grid.close()
+            raise ValueError(f"Shared memory block {name} holds no requirements!")
+        xinfo, yinfo = clues
+        game = cls.__new__(cls)
+        game.__xinfo = tuple(NonogramClue.get(requirements, grid.width) for requirements in xinfo)
+        game.__yinfo = tuple(NonogramClue.get(requirements, grid.height) for requirements in yinfo)
+        game.__grid = grid
+        return game
 
     # Properties
 
+    @property
+    def grid(self):
+        "Get the storage backend of the board"
+        return self.__grid
+
     @property
     def xinfo(self):
-        "Get the requirements for all columns"
+        "Get the requirements for all rows"
         return self.__xinfo
 
     @property
@@ -57,7 +91,7 @@ class NonogramGame():
             raise IndexError('Index must be a tuple of length 2')
         x, y = pos
         if 0 <= x < self.width and 0 <= y < self.height:
-            return self.__board[y][x]
+            return self.__grid.get(x, y)
         raise IndexError('Grid index out of range')
 
     def __setitem__(self, pos, value):
@@ -67,23 +101,25 @@ class NonogramGame():
         x, y = pos
         if not (0 <= x < self.width and 0 <= y < self.height):
             raise IndexError('Grid index out of range')
-        self.__board[y][x] = value
+        self.__grid.set(x, y, value)
+
+    def getrow(self, index):
+        "Get a copy of a row"
+        return self.__grid.getrow(index)
+
+    def getcol(self, index):
+        "Get a copy of a column"
+        return self.__grid.getcol(index)
 
     @property
     def rows(self):
         "Get a list of all rows"
-        return [
-            [self[x, y] for x in range(self.width)]
-            for y in range(self.height)
-        ]
+        return [self.getrow(y) for y in range(self.height)]
 
     @property
     def cols(self):
         "Get a list of all columns"
-        return [
-            [self[x, y] for y in range(self.height)]
-            for x in range(self.width)
-        ]
+        return [self.getcol(x) for x in range(self.width)]
 
     def replacerow(self, index, values):
         "Replace a row"
@@ -98,47 +134,104 @@ class NonogramGame():
     # Utils
 
     def export(self):
-        "Get a copy of this board's data to create a new one later with `NonogramGame(**data)`"
+        """Get this board's data to create a new one later with `NonogramGame(**data)`
+        The requirements are immutable tuples shared with this game, the board is a copy."""
         return {
-            'xinfo': copy.deepcopy(self.__xinfo),
-            'yinfo': copy.deepcopy(self.__yinfo),
-            'board': copy.deepcopy(self.__board),
+            'xinfo': self.__xinfo,
+            'yinfo': self.__yinfo,
+            'board': self.__grid.tolist(),
         }
 
+    def copy(self):
+        "Get an independent copy of this game which shares the requirements"
+        game = self.__class__.__new__(self.__class__)
+        game.__xinfo = self.__xinfo
+        game.__yinfo = self.__yinfo
+        game.__grid = self.__grid.copy()
+        return game
+
+    def toshared(self):
+        """Get a copy of this game in a shared memory block which also holds the requirements
+        Other processes can attach to it with `NonogramGame.fromshared(game.grid.name)`."""
+        game = self.__class__.__new__(self.__class__)
+        game.__xinfo = self.__xinfo
+        game.__yinfo = self.__yinfo
+        game.__grid = SharedGrid(self.__grid.tolist(), clues=(self.__xinfo, self.__yinfo))
+        return game
+
+    def snapshot(self):
+        "Get a snapshot of the board which can be restored with `restore`"
+        return self.__grid.snapshot()
+
+    def restore(self, snapshot):
+        "Restore the board from a snapshot"
+        self.__grid.restore(snapshot)
+
     # Display
+    # Rendering lives in nonogram.render so that the game works without rich
 
-    def __get_table(self):
-        tab = Table(
-            Column(justify='right', no_wrap=True),
-            title="Nonogram game",
-            caption="[link=https://github.com/rafaelurben/python-nonogram]python-nonogram[/link] by "
-                    "[link=https://github.com/rafaelurben]rafaelurben[/link]",
-        )
-        for col in range(self.width):
-            tab.add_column(
-                "\n".join(map(str, self.yinfo[col])),
-                justify='center'
-            )
-        for row in range(self.height):
-            tab.add_row(
-                " ".join(map(str, self.xinfo[row])),
-                *map(_cell, self.rows[row])
-            )
-        return tab
+    def __str__(self):
+        from nonogram.render import gettext
+        return gettext(self)
 
     def __rich_console__(self, console, options):
-        yield Rule(end='\n')
-        yield self.__get_table()
-        yield Rule(end='\n')
+        from nonogram.render import getrenderables
+        yield from getrenderables(self)
 
     def print(self):
         "Print this gameboard"
-
-        log(Rule(end='\n'), self.__get_table(), Rule(end='\n'))
+        from nonogram.render import printgame
+        printgame(self)
 
     # Solving
 
-    def solve(self):
-        "Solve the board with the solver module"
-
-        return NonogramBoardSolver.solve(self)
+    def solve(self, mode="logic", nodelimit=None, timelimit=None, stats=None, workers=None):
+        """Solve the board with the solver module
+
+        Modes:
+        - "logic": Only use line logic
+        - "probe": Use line logic and probe both values of fields if it gets stuck
+        - "search": Use line logic and guess fields if it gets stuck.
+          The search stops after `nodelimit` guesses or `timelimit` seconds.
+
+        Pass a `NonogramSolverStats` as `stats` to collect statistics. With more
+        than one of `workers`, line logic solves the lines of large boards on
+        that many processes ("logic" and "probe" modes)."""
+
+        if mode == "logic":
+            return NonogramBoardSolver.solve(self, stats=stats, workers=workers)
+        if mode == "probe":
+            return NonogramBoardSolver.solve(self, stats=stats, probing=True, workers=workers)
+        if mode == "search":
+            return NonogramSearchSolver.solve(self, nodelimit=nodelimit, timelimit=timelimit, stats=stats)
+        raise ValueError(f"Unknown solving mode: {mode}")
+
+    def countsolutions(self, limit=2, nodelimit=None, timelimit=None):
+        """Count the solutions of this board, stopping as soon as `limit` are found
+        The board is left unchanged (see `NonogramSearchSolver.countsolutions`)"""
+        return NonogramSearchSolver.countsolutions(self, limit, nodelimit, timelimit)
+
+    def nexthint(self):
+        """Get the next fields which can be deduced with the least work
+        Returns None if line logic can't deduce anything (see `NonogramHintSolver.gethint`)"""
+        return NonogramHintSolver.gethint(self)
+
+    def setandpropagate(self, x, y, value):
+        """Set the field at (col, row) and deduce what follows from it by line logic
+
+        Only the row and column of the field and lines crossing newly deduced
+        fields are solved again. Returns the deduced fields as [(col, row, value), ...].
+        If the move leads to a contradiction, the board is left unchanged and
+        UnsolvableState is raised."""
+
+        if value is None:
+            raise ValueError("Only True or False can be propagated!")
+
+        snapshot = self.snapshot()
+        self[x, y] = value
+        try:
+            changed = NonogramBoardSolver.propagate(self, [(ROW, y), (COL, x)])
+        except UnsolvableState:
+            self.restore(snapshot)
+            raise
+        return [(col, row, self[col, row]) for col, row in changed]
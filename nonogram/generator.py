@@ -0,0 +1,77 @@
+"Random Nonogram puzzle generator"
+
+import random
+
+from nonogram.game import NonogramGame
+from nonogram.solver.exceptions import SearchLimitReached
+
+
+def getclues(line):
+    "Get the requirements of a fully known line"
+    requirements = []
+    curr = 0
+    for val in line:
+        if val:
+            curr += 1
+        elif curr:
+            requirements.append(curr)
+            curr = 0
+    if curr:
+        requirements.append(curr)
+    return requirements
+
+
+def randomimage(width, height, density=0.5, rand=random):
+    "Get a random image as a list of rows with True for filled fields"
+    return [[rand.random() < density for _ in range(width)] for _ in range(height)]
+
+
+def fromimage(image):
+    "Get the game data of a puzzle with the given solution and an empty board"
+    width = len(image[0]) if image else 0
+    return {
+        'xinfo': [getclues(row) for row in image],
+        'yinfo': [getclues([row[x] for row in image]) for x in range(width)],
+        'board': [[None]*width for _ in image],
+    }
+
+
+def islogicsolvable(data):
+    """Check if a puzzle can be solved by line logic alone
+    Such puzzles always have exactly one solution."""
+    return NonogramGame(**data).solve()
+
+
+def isunique(data, nodelimit=10000):
+    """Check if a puzzle has exactly one solution
+    Puzzles whose search exceeds `nodelimit` guesses are treated as not unique."""
+    game = NonogramGame(**data)
+    if game.solve():
+        return True
+    try:
+        return game.countsolutions(limit=2, nodelimit=nodelimit) == 1
+    except SearchLimitReached:
+        return False
+
+
+def generate(width, height, density=0.5, seed=None, unique=False, maxtries=1000):
+    """Generate a random puzzle
+
+    The same seed always gives the same puzzle. With `unique`, images are drawn
+    until the puzzle has exactly one solution. Output format: (gamedata, solution)"""
+
+    rand = random.Random(seed)
+    for _ in range(maxtries):
+        image = randomimage(width, height, density, rand)
+        data = fromimage(image)
+        if not unique or isunique(data):
+            return data, image
+    raise ValueError(f"No unique puzzle found in {maxtries} tries!")
+
+
+def generatemany(count, width, height, density=0.5, seed=0, unique=False, maxtries=1000):
+    """Generate puzzles with the seeds seed, seed+1, ...
+    Output format: (seed, gamedata, solution)"""
+    for i in range(count):
+        data, image = generate(width, height, density, seed+i, unique, maxtries)
+        yield seed+i, data, image
@@ -0,0 +1,376 @@
+"Storage backends for the fields of a Nonogram game"
+
+import struct
+
+
+def _importnumpy():
+    "Helper function: Import NumPy on first use, it is only needed by NumpyGrid"
+    try:
+        import numpy
+    except ImportError as exc:
+        raise ImportError("The numpy backend requires NumPy to be installed!") from exc
+    return numpy
+
+
+class ListGrid():
+    """Grid storing fields as a list of rows with True/False/None values
+
+    Snapshots share the row lists with the grid. A row is only copied once it
+    gets modified afterwards (copy on write)."""
+
+    def __init__(self, board, copy=True):
+        self.height = len(board)
+        self.width = len(board[0]) if board else 0
+        self.__rows = [list(row) for row in board] if copy else board
+        self.__shared = [False]*self.height
+
+    def get(self, x, y):
+        "Get the field at (col, row)"
+        return self.__rows[y][x]
+
+    def set(self, x, y, value):
+        "Set the field at (col, row)"
+        if self.__shared[y]:
+            self.__rows[y] = list(self.__rows[y])
+            self.__shared[y] = False
+        self.__rows[y][x] = value
+
+    def getrow(self, index):
+        "Get a copy of a row"
+        return list(self.__rows[index])
+
+    def getcol(self, index):
+        "Get a copy of a column"
+        return [row[index] for row in self.__rows]
+
+    def tolist(self):
+        "Get a copy of all rows"
+        return [list(row) for row in self.__rows]
+
+    def snapshot(self):
+        "Get a snapshot which can be restored with `restore`"
+        self.__shared = [True]*self.height
+        return tuple(self.__rows)
+
+    def restore(self, snapshot):
+        "Restore a snapshot"
+        self.__rows = list(snapshot)
+        self.__shared = [True]*self.height
+
+    def copy(self):
+        "Get an independent grid sharing the rows until they are modified"
+        grid = ListGrid([], copy=False)
+        grid.height = self.height
+        grid.width = self.width
+        grid.restore(self.snapshot())
+        return grid
+
+
+class BitGrid():
+    """Grid storing every line as two bitmasks: known filled and known empty fields
+
+    Rows and columns are both stored, so reading or writing a field only touches
+    four integers. Bit x of a row mask is the field in column x, bit y of a
+    column mask is the field in row y. The board solver passes the masks of a
+    line to the line cache as they are (see `getrowbits` and `getcolbits`)."""
+
+    def __init__(self, board, copy=True):
+        self.height = len(board)
+        self.width = len(board[0]) if board else 0
+        self.__rowfilled = [0]*self.height
+        self.__rowempty = [0]*self.height
+        self.__colfilled = [0]*self.width
+        self.__colempty = [0]*self.width
+        for y, row in enumerate(board):
+            for x, value in enumerate(row):
+                if value is not None:
+                    self.set(x, y, value)
+
+    def get(self, x, y):
+        "Get the field at (col, row)"
+        if self.__rowfilled[y] >> x & 1:
+            return True
+        if self.__rowempty[y] >> x & 1:
+            return False
+        return None
+
+    def set(self, x, y, value):
+        "Set the field at (col, row)"
+        xbit = 1 << x
+        ybit = 1 << y
+        if value is True:
+            self.__rowfilled[y] |= xbit
+            self.__colfilled[x] |= ybit
+        else:
+            self.__rowfilled[y] &= ~xbit
+            self.__colfilled[x] &= ~ybit
+        if value is False:
+            self.__rowempty[y] |= xbit
+            self.__colempty[x] |= ybit
+        else:
+            self.__rowempty[y] &= ~xbit
+            self.__colempty[x] &= ~ybit
+
+    def getrowbits(self, index):
+        """Get the bitmasks of a row
+        Output format: (filled, empty)"""
+        return self.__rowfilled[index], self.__rowempty[index]
+
+    def getcolbits(self, index):
+        """Get the bitmasks of a column
+        Output format: (filled, empty)"""
+        return self.__colfilled[index], self.__colempty[index]
+
+    @classmethod
+    def unpack(cls, filled, empty, length):
+        "Convert a pair of bitmasks to a list of True/False/None values"
+        return [
+            True if filled >> i & 1 else False if empty >> i & 1 else None
+            for i in range(length)
+        ]
+
+    def getrow(self, index):
+        "Get a copy of a row"
+        return self.unpack(self.__rowfilled[index], self.__rowempty[index], self.width)
+
+    def getcol(self, index):
+        "Get a copy of a column"
+        return self.unpack(self.__colfilled[index], self.__colempty[index], self.height)
+
+    def tolist(self):
+        "Get a copy of all rows"
+        return [self.getrow(y) for y in range(self.height)]
+
+    def snapshot(self):
+        "Get a snapshot which can be restored with `restore`"
+        return (tuple(self.__rowfilled), tuple(self.__rowempty),
+                tuple(self.__colfilled), tuple(self.__colempty))
+
+    def restore(self, snapshot):
+        "Restore a snapshot"
+        self.__rowfilled = list(snapshot[0])
+        self.__rowempty = list(snapshot[1])
+        self.__colfilled = list(snapshot[2])
+        self.__colempty = list(snapshot[3])
+
+    def copy(self):
+        "Get an independent grid"
+        grid = BitGrid([])
+        grid.height = self.height
+        grid.width = self.width
+        grid.restore(self.snapshot())
+        return grid
+
+
+class NumpyGrid():
+    """Grid storing fields in an int8 matrix (requires NumPy)
+
+    -1 is an unknown, 0 an empty and 1 a filled field. The matrix is indexed
+    as [row, col] and can be used directly by vectorized solvers."""
+
+    _values = {-1: None, 0: False, 1: True}
+
+    def __init__(self, board, copy=True):
+        numpy = _importnumpy()
+        self.height = len(board)
+        self.width = len(board[0]) if board else 0
+        self.matrix = numpy.array([
+            [-1 if value is None else int(value) for value in row]
+            for row in board
+        ], dtype=numpy.int8).reshape(self.height, self.width)
+
+    def get(self, x, y):
+        "Get the field at (col, row)"
+        return self._values[int(self.matrix[y, x])]
+
+    def set(self, x, y, value):
+        "Set the field at (col, row)"
+        self.matrix[y, x] = -1 if value is None else int(value)
+
+    def getrow(self, index):
+        "Get a copy of a row"
+        return [self._values[value] for value in self.matrix[index].tolist()]
+
+    def getcol(self, index):
+        "Get a copy of a column"
+        return [self._values[value] for value in self.matrix[:, index].tolist()]
+
+    def tolist(self):
+        "Get a copy of all rows"
+        return [
+            [self._values[value] for value in row]
+            for row in self.matrix.tolist()
+        ]
+
+    def snapshot(self):
+        "Get a snapshot which can be restored with `restore`"
+        return self.matrix.copy()
+
+    def restore(self, snapshot):
+        "Restore a snapshot"
+        self.matrix[...] = snapshot
+
+    def copy(self):
+        "Get an independent grid"
+        grid = NumpyGrid([])
+        grid.height = self.height
+        grid.width = self.width
+        grid.matrix = self.matrix.copy()
+        return grid
+
+
+class SharedGrid():
+    """Grid storing fields in a block of shared memory (multiprocessing.shared_memory)
+
+    -1 is an unknown, 0 an empty and 1 a filled field, stored row by row like
+    NumpyGrid. The block can also hold the requirements, so other processes can
+    attach to it by name with `SharedGrid.attach` and work on the same fields
+    without copying or pickling anything.
+
+    Block layout: a header of 4 uint32 (width, height, number of clue ints, 0),
+    the clue ints (block count followed by the blocks for every row and then
+    every column) and the fields. The grid which created a block unlinks it
+    once it is garbage collected or `unlink` is called."""
+
+    _values = {-1: None, 0: False, 1: True}
+    _codes = {None: -1, False: 0, True: 1}
+    _headersize = 16
+
+    def __init__(self, board, copy=True, clues=None):
+        from multiprocessing import shared_memory
+
+        height = len(board)
+        width = len(board[0]) if board else 0
+        # Encode everything first, so that invalid data raises before the block exists
+        encoded = self._encodeclues(clues) if clues is not None else []
+        header = struct.pack(f"{4+len(encoded)}I", width, height, len(encoded), 0, *encoded)
+        codes = self._codes
+        fields = bytes(codes[value] & 0xff for row in board for value in row)
+
+        self._shm = shared_memory.SharedMemory(create=True, size=max(len(header)+width*height, 1))
+        self._owner = True
+        try:
+            self._shm.buf[:len(header)] = header
+            self._setup()
+            self._raw[:] = fields
+        except BaseException:
+            self.close()
+            raise
+
+    @classmethod
+    def attach(cls, name):
+        "Attach to a block created in another process (nothing is copied)"
+        from multiprocessing import shared_memory
+
+        grid = cls.__new__(cls)
+        grid._shm = shared_memory.SharedMemory(name=name)
+        grid._owner = False
+        grid._setup()
+        return grid
+
+    def _setup(self):
+        "Helper function: Read the header and create the views of the fields"
+        self.width, self.height, cluesize = struct.unpack_from("3I", self._shm.buf)
+        offset = self._headersize+4*cluesize
+        self._raw = self._shm.buf[offset:offset+self.width*self.height]
+        self.fields = self._raw.cast('b')
+
+    @classmethod
+    def _encodeclues(cls, clues):
+        "Helper function: Flatten (xinfo, yinfo) to a list of ints"
+        encoded = []
+        for info in clues:
+            for requirements in info:
+                encoded.append(len(requirements))
+                encoded.extend(requirements)
+        return encoded
+
+    def getclues(self):
+        """Get the requirements stored in the block
+        Returns None if the block holds no requirements.
+        Output format: (xinfo, yinfo)"""
+        cluesize = struct.unpack_from("3I", self._shm.buf)[2]
+        if not cluesize:
+            return None
+        encoded = struct.unpack_from(f"{cluesize}I", self._shm.buf, self._headersize)
+        clues = []
+        pos = 0
+        for count in (self.height, self.width):
+            info = []
+            for _ in range(count):
+                length = encoded[pos]
+                info.append(tuple(encoded[pos+1:pos+1+length]))
+                pos += length+1
+            clues.append(tuple(info))
+        return tuple(clues)
+
+    @property
+    def name(self):
+        "Get the name of the shared memory block"
+        return self._shm.name
+
+    def get(self, x, y):
+        "Get the field at (col, row)"
+        return self._values[self.fields[y*self.width+x]]
+
+    def set(self, x, y, value):
+        "Set the field at (col, row)"
+        self.fields[y*self.width+x] = self._codes[value]
+
+    def getrow(self, index):
+        "Get a copy of a row"
+        values = self._values
+        start = index*self.width
+        return [values[value] for value in self.fields[start:start+self.width].tolist()]
+
+    def getcol(self, index):
+        "Get a copy of a column"
+        values = self._values
+        return [values[value] for value in self.fields[index::self.width].tolist()]
+
+    def tolist(self):
+        "Get a copy of all rows"
+        return [self.getrow(y) for y in range(self.height)]
+
+    def snapshot(self):
+        "Get a snapshot which can be restored with `restore`"
+        return bytes(self._raw)
+
+    def restore(self, snapshot):
+        "Restore a snapshot"
+        self._raw[:] = snapshot
+
+    def copy(self):
+        "Get an independent grid in a new block with the same requirements"
+        return SharedGrid(self.tolist(), clues=self.getclues())
+
+    def close(self):
+        "Detach from the block, the grid can't be used anymore afterwards"
+        if getattr(self, "_shm", None) is None:
+            return
+        # Views are missing if creating or attaching failed halfway
+        for view in (getattr(self, "fields", None), getattr(self, "_raw", None)):
+            if view is not None:
+                view.release()
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+        self._shm = None
+
+    def unlink(self):
+        "Detach from the block and free it (only possible in the creating process)"
+        if not self._owner:
+            raise ValueError("Only the grid which created a block can unlink it!")
+        self.close()
+
+    def __del__(self):
+        if getattr(self, "_shm", None) is not None:
+            self.close()
+
+
+grids = {
+    "list": ListGrid,
+    "bits": BitGrid,
+    "numpy": NumpyGrid,
+    "shared": SharedGrid,
+}
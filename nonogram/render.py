@@ -0,0 +1,60 @@
+"""Rendering of Nonogram games
+
+This is the only module drawing games. The solver and the game itself don't
+depend on it, and rich is only imported once a game is rendered with it."""
+
+
+def getcell(value):
+    "Get the symbol of a field"
+    if value is True:
+        return '⬛'
+    if value is False:
+        return '❌'
+    return None
+
+
+def gettable(game):
+    "Get a rich table showing the requirements and fields of a game"
+    from rich.table import Table, Column
+
+    tab = Table(
+        Column(justify='right', no_wrap=True),
+        title="Nonogram game",
+        caption="[link=https://github.com/rafaelurben/python-nonogram]python-nonogram[/link] by "
+                "[link=https://github.com/rafaelurben]rafaelurben[/link]",
+    )
+    for col in range(game.width):
+        tab.add_column(
+            "\n".join(map(str, game.yinfo[col])),
+            justify='center'
+        )
+    for row in range(game.height):
+        tab.add_row(
+            " ".join(map(str, game.xinfo[row])),
+            *map(getcell, game.rows[row])
+        )
+    return tab
+
+
+def getrenderables(game):
+    "Get the rich renderables of a game framed by rules"
+    from rich.rule import Rule
+
+    return [Rule(end='\n'), gettable(game), Rule(end='\n')]
+
+
+def gettext(game):
+    """Get a plain text picture of a game without requirements
+    Filled fields are '#', empty fields '.' and unknown fields '?'."""
+    symbols = {True: '#', False: '.', None: '?'}
+    return "\n".join("".join(symbols[value] for value in row) for row in game.rows)
+
+
+def printgame(game):
+    "Print a game with rich if it is installed and as plain text otherwise"
+    try:
+        from rich import print as rprint
+    except ImportError:
+        print(gettext(game))
+    else:
+        rprint(*getrenderables(game))
@@ -0,0 +1,317 @@
+"""Solving service for Nonogram games
+
+Requests and responses are JSON lines, read from stdin and written to stdout
+or exchanged over TCP connections:
+
+- Solve: {"id": ..., "xinfo": ..., "yinfo": ..., "board": ..., "mode": ..., "timeout": ...}
+  ("id", "board", "mode" and "timeout" are optional)
+- Cancel: {"cancel": id}
+
+Every solve request gets exactly one response with the same id:
+{"id", "solved", "seconds", "error", **game.export()}. Cancelled requests and
+requests exceeding their deadline are answered with an error and without
+a board."""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from nonogram.batch import getsavedir, initworker, mergecache, solvepuzzle
+from nonogram.formats import getgamedata
+
+MODES = ("logic", "probe", "search")
+
+
+def solvejobs(jobs):
+    """Solve a list of puzzles with their own mode and time limit (runs in a worker process)
+    Input format: [(name, gamedata, mode, timelimit), ...]"""
+    return [solvepuzzle(*job) for job in jobs]
+
+
+class NonogramJob():
+    "A solve request waiting for its result"
+
+    def __init__(self, key, data, mode, deadline):
+        self.key = key
+        self.data = data
+        self.mode = mode
+        self.deadline = deadline
+        self.future = asyncio.get_running_loop().create_future()
+
+    def gettimelimit(self):
+        "Get the seconds left until the deadline (None if there is no deadline)"
+        if self.deadline is None:
+            return None
+        return max(self.deadline-time.monotonic(), 0)
+
+
+class NonogramServer():
+    """Service solving puzzles in a pool of worker processes
+
+    Waiting requests are sent to the workers in chunks of up to `chunksize`
+    and at most `maxpending` chunks are in flight at once. Requests beyond
+    `maxqueue` waiting ones are rejected. `timeout` is the default deadline
+    per request in seconds; in search mode it is also the solver's time limit.
+    With `cache`, the workers start with the line cache saved in this file and
+    their caches are merged into it when the server is closed."""
+
+    def __init__(self, workers=None, chunksize=4, maxpending=None, maxqueue=1000,
+                 mode="logic", timeout=None, cache=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunksize = chunksize
+        self.maxpending = maxpending or 2*self.workers
+        self.maxqueue = maxqueue
+        self.mode = mode
+        self.timeout = timeout
+        self.cache = cache
+
+        self._executor = None
+        self._savedir = None
+        self._dispatcher = None
+        self._queue = deque()
+        self._waiting = None
+        self._slots = None
+
+    # Lifecycle
+
+    async def start(self):
+        "Start the worker processes and the dispatcher"
+        loop = asyncio.get_running_loop()
+        self._savedir = getsavedir(self.cache)
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=initworker,
+                                             initargs=(self.cache, self._savedir))
+        # Start the workers now instead of on the first requests
+        await asyncio.gather(*(
+            loop.run_in_executor(self._executor, solvejobs, [])
+            for _ in range(self.workers)
+        ))
+        self._waiting = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.maxpending)
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def close(self):
+        "Cancel all waiting requests and stop the workers"
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+        while self._queue:
+            self._queue.popleft().future.cancel()
+        if self._executor is not None:
+            if self._savedir:
+                # The workers save their caches when they exit
+                await asyncio.to_thread(self._executor.shutdown, cancel_futures=True)
+                mergecache(self.cache, self._savedir)
+            else:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    # Solving
+
+    def submit(self, key, data, mode=None, timeout=None):
+        """Queue a puzzle and get its job
+        Raises ValueError for unknown modes and OverflowError if the queue is full."""
+        mode = mode or self.mode
+        if mode not in MODES:
+            raise ValueError(f"Unknown solving mode: {mode}")
+        if len(self._queue) >= self.maxqueue:
+            raise OverflowError("Too many waiting requests!")
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic()+timeout
+        job = NonogramJob(key, data, mode, deadline)
+        self._queue.append(job)
+        self._waiting.set()
+        return job
+
+    async def getresult(self, job):
+        """Wait for the result of a job
+        Output format: {"solved", "seconds", "error", **game.export()}"""
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(job.future, job.gettimelimit())
+        except asyncio.TimeoutError:
+            error = "Deadline exceeded"
+        except asyncio.CancelledError:
+            if not job.future.cancelled():
+                raise
+            error = "Cancelled"
+        return {
+            'solved': False,
+            'seconds': round(time.perf_counter()-start, 6),
+            'error': error,
+        }
+
+    async def solve(self, data, mode=None, timeout=None):
+        "Solve a puzzle (see `getresult` for the output format)"
+        return await self.getresult(self.submit(None, data, mode, timeout))
+
+    def _getchunk(self):
+        "Helper function: Take the next waiting jobs which are neither cancelled nor expired"
+        chunk = []
+        while self._queue and len(chunk) < self.chunksize:
+            job = self._queue.popleft()
+            if not job.future.done():
+                chunk.append(job)
+        return chunk
+
+    async def _dispatch(self):
+        "Send waiting jobs to the workers"
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            chunk = self._getchunk()
+            while not chunk:
+                self._waiting.clear()
+                await self._waiting.wait()
+                chunk = self._getchunk()
+
+            jobs = [
+                (job.key, job.data, job.mode, job.gettimelimit() if job.mode == "search" else None)
+                for job in chunk
+            ]
+            future = loop.run_in_executor(self._executor, solvejobs, jobs)
+            future.add_done_callback(lambda future, chunk=chunk: self._finish(chunk, future))
+
+    def _finish(self, chunk, future):
+        "Helper function: Hand the results of a chunk to its jobs"
+        self._slots.release()
+        if future.cancelled():
+            results = [None]*len(chunk)
+        elif future.exception() is not None:
+            error = f"{type(future.exception()).__name__}: {future.exception()}"
+            results = [{'solved': False, 'seconds': 0, 'error': error}]*len(chunk)
+        else:
+            results = future.result()
+        for job, result in zip(chunk, results):
+            if job.future.done():
+                continue  # Cancelled or expired while being solved
+            if result is None:
+                job.future.cancel()
+            else:
+                result.pop('name', None)
+                job.future.set_result(result)
+
+    # Protocol
+
+    async def handle(self, readline, writeline):
+        """Answer JSON line requests until `readline` returns an empty line
+
+        `readline` is a coroutine function returning the next line and
+        `writeline` a coroutine function writing a line. Requests still being
+        solved when the input ends are answered before returning, unless the
+        handler is cancelled."""
+        # Jobs by their JSON encoded id (ids can be any JSON value)
+        jobs = {}
+        tasks = set()
+
+        async def respond(requestid, job):
+            key = json.dumps(requestid)
+            try:
+                result = await self.getresult(job)
+                await writeline(json.dumps({'id': requestid, **result}))
+            finally:
+                if jobs.get(key) is job:
+                    del jobs[key]
+
+        try:
+            while True:
+                line = await readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("Requests have to be JSON objects")
+                except ValueError as exc:
+                    await writeline(json.dumps({'id': None, 'error': f"Invalid request: {exc}"}))
+                    continue
+
+                if 'cancel' in request:
+                    job = jobs.get(json.dumps(request['cancel']))
+                    if job is not None:
+                        job.future.cancel()
+                    continue
+
+                requestid = request.pop('id', None)
+                mode = request.pop('mode', None)
+                timeout = request.pop('timeout', None)
+                try:
+                    job = self.submit(requestid, getgamedata(**request), mode, timeout)
+                except (TypeError, ValueError, OverflowError) as exc:
+                    await writeline(json.dumps({'id': requestid, 'solved': False, 'error': str(exc)}))
+                    continue
+                jobs[json.dumps(requestid)] = job
+                task = asyncio.create_task(respond(requestid, job))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            for job in jobs.values():
+                job.future.cancel()
+            for task in tasks:
+                task.cancel()
+
+    async def servestdio(self):
+        "Answer requests from stdin on stdout"
+        loop = asyncio.get_running_loop()
+
+        async def readline():
+            return await loop.run_in_executor(None, sys.stdin.readline)
+
+        async def writeline(line):
+            sys.stdout.write(line+"\n")
+            sys.stdout.flush()
+
+        await self.handle(readline, writeline)
+
+    async def servetcp(self, host="127.0.0.1", port=8765):
+        "Answer requests on TCP connections until cancelled"
+
+        async def connection(reader, writer):
+            lock = asyncio.Lock()
+
+            async def writeline(line):
+                async with lock:
+                    writer.write(line.encode()+b"\n")
+                    await writer.drain()
+
+            async def readline():
+                return (await reader.readline()).decode()
+
+            try:
+                await self.handle(readline, writeline)
+            except ConnectionError:
+                pass
+            finally:
+                writer.close()
+
+        server = await asyncio.start_server(connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+async def serve(host=None, port=None, **options):
+    """Run a server on TCP if a port is given, otherwise on stdin and stdout
+    `options` are passed to `NonogramServer`."""
+    async with NonogramServer(**options) as server:
+        if port is None:
+            await server.servestdio()
+        else:
+            await server.servetcp(host or "127.0.0.1", port)
@@ -2,3 +2,11 @@
 
 from .board import NonogramBoardSolver
 from .lines import NonogramLineSolver
+from .settle import NonogramSettleSolver
+from .search import NonogramSearchSolver
+from .probing import NonogramProbeSolver
+from .parallel import NonogramParallelSolver
+from .cache import NonogramLineCache, linecache
+from .stats import NonogramSolverStats
+from .clues import NonogramClue
+from .hints import NonogramHintSolver
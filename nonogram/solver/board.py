@@ -1,14 +1,91 @@
 "Solver for Nonogram boards"
 
-from rich.rule import Rule
+import time
+from collections import deque
 
+from nonogram.solver.cache import linecache
 from nonogram.solver.lines import NonogramLineSolver
-from nonogram.utils import debug
+from nonogram.solver.settle import NonogramSettleSolver
+from nonogram.utils import DEBUG, INFO, debug, event, info, rule, tracing
+
+ROW = 0
+COL = 1
 
 
 class NonogramBoardSolver:
     "Class for solving nonogram boards"
 
+    # Smallest NumPy backed boards (in fields) solved by the vectorized solver,
+    # below this solving line by line is faster (see `nonogram bench --backend numpy`)
+    vectorsize = 100*100
+
+    # Line helpers
+
+    @classmethod
+    def getlines(cls, game):
+        """Get all lines of a board, columns first
+        Output format: [(axis, index), ...]"""
+        return [(COL, i) for i in range(game.width)] + \
+            [(ROW, i) for i in range(game.height)]
+
+    @classmethod
+    def getline(cls, game, line):
+        """Get the values and requirements of a line
+        Output format: (values, requirements)"""
+        axis, index = line
+        if axis == ROW:
+            return game.getrow(index), game.xinfo[index]
+        return game.getcol(index), game.yinfo[index]
+
+    @classmethod
+    def getlinebits(cls, game, line):
+        """Get a line packed into bitmasks if the board stores them (see BitGrid)
+        Returns None for other backends.
+        Output format: (filled, empty)"""
+        grid = game.grid
+        if not hasattr(grid, "getrowbits"):
+            return None
+        axis, index = line
+        return grid.getrowbits(index) if axis == ROW else grid.getcolbits(index)
+
+    @classmethod
+    def solveline(cls, game, line, linesolver):
+        """Solve a line of a board without changing it
+        Bit-packed lines are passed to the cache as they are and only the changed
+        bits are unpacked.
+        Output format: [(i, value), ...]"""
+        bits = cls.getlinebits(game, line)
+        if bits is None:
+            values, requirements = cls.getline(game, line)
+            old = list(values)
+            values = linecache.solve(linesolver, values, requirements)
+            return [(i, val) for i, val in enumerate(values) if val is not old[i]]
+
+        filled, empty = bits
+        axis, index = line
+        requirements = game.xinfo[index] if axis == ROW else game.yinfo[index]
+        length = game.width if axis == ROW else game.height
+        newfilled, newempty = linecache.solvebits(linesolver, filled, empty, requirements, length)
+        newfilled &= ~filled
+        newempty &= ~empty
+        changes = []
+        bits = newfilled | newempty
+        while bits:
+            bit = bits & -bits
+            changes.append((bit.bit_length()-1, bool(newfilled & bit)))
+            bits ^= bit
+        return changes
+
+    @classmethod
+    def getpos(cls, line, i):
+        "Get the (col, row) position of the i-th field of a line"
+        axis, index = line
+        if axis == ROW:
+            return (i, index)
+        return (index, i)
+
+    # Check helpers
+
     @classmethod
     def issolved(cls, game):
         "Check if a board is solved"
@@ -21,36 +98,110 @@ class NonogramBoardSolver:
                 return False
         return True
 
+    # Solving
+
     @classmethod
-    def solve(cls, game):
-        "Solve the board"
+    def propagate(cls, game, lines=None, stats=None):
+        """Solve lines until no line changes anymore
 
-        oldhash = hash(str(game.rows))
+        Only lines crossing a changed field are solved again. Lines are overlapped
+        first and only settled exactly once overlapping makes no more progress.
+        Returns the list of changed fields as (col, row)."""
 
-        # Step 1: individual lines
-        columns = game.cols
-        yinfo = game.yinfo
-        for i in range(game.width):
-            debug(Rule(f"Solve column #{i}"))
-            game.replacecol(
-                i, NonogramLineSolver.solve(columns[i], yinfo[i]))
+        if stats is not None:
+            stats.propagations += 1
+            with stats.phase("propagate"):
+                return cls._propagate(game, lines, stats)
+        return cls._propagate(game, lines, None)
 
-        rows = game.rows
-        xinfo = game.xinfo
-        for i in range(game.height):
-            debug(Rule(f"Solve row #{i}"))
-            game.replacerow(
-                i, NonogramLineSolver.solve(rows[i], xinfo[i]))
+    @classmethod
+    def _propagate(cls, game, lines, stats):
+        if lines is None:
+            lines = cls.getlines(game)
 
-        if cls.issolved(game):
-            debug(game, Rule(title="Solving completed"))
-            return True
+        queue = deque(lines)
+        queued = set(queue)
+        unsettled = deque(lines)
+        unsettledset = set(unsettled)
+        changed = []
+
+        while queue or unsettled:
+            if queue:
+                line = queue.popleft()
+                queued.discard(line)
+                linesolver = NonogramLineSolver
+            else:
+                line = unsettled.popleft()
+                unsettledset.discard(line)
+                linesolver = NonogramSettleSolver
+
+            if __debug__ and tracing.debug:
+                debug(rule(f"Solve {'row' if line[0] == ROW else 'column'} #{line[1]}"))
+
+            if stats is not None:
+                cachehits = linecache.hits
+                start = time.perf_counter()
+            linechanges = cls.solveline(game, line, linesolver)
+
+            linechanged = False
+            changedbefore = len(changed)
+            for i, val in linechanges:
+                pos = cls.getpos(line, i)
+                game[pos] = val
+                changed.append(pos)
+                linechanged = True
+
+                crossing = (1-line[0], i)
+                if crossing not in queued:
+                    queue.append(crossing)
+                    queued.add(crossing)
+                if crossing not in unsettledset:
+                    unsettled.append(crossing)
+                    unsettledset.add(crossing)
 
-        newhash = hash(str(game.rows))
+            if stats is not None:
+                stats.addline(line, linesolver.strategy, len(changed)-changedbefore,
+                              time.perf_counter()-start, linecache.hits > cachehits)
+            if __debug__ and tracing.events:
+                event(DEBUG, "line", axis="row" if line[0] == ROW else "col", index=line[1],
+                      solver=linesolver.__name__, changed=len(changed)-changedbefore)
 
-        if oldhash != newhash:
-            debug(game, Rule(title="Next solving cycle"))
-            return cls.solve(game)
+            # Overlapped lines still have to be settled, settled lines are exact
+            if linechanged and linesolver is NonogramLineSolver and line not in unsettledset:
+                unsettled.append(line)
+                unsettledset.add(line)
+
+        return changed
+
+    @classmethod
+    def solve(cls, game, stats=None, probing=False, workers=None):
+        """Solve the board
+        With `probing`, fields are probed once line logic gets stuck. With more
+        than one of `workers`, the lines are solved on that many processes."""
+
+        if workers is not None and workers > 1:
+            from nonogram.solver.parallel import NonogramParallelSolver
+            NonogramParallelSolver.propagate(game, workers, stats)
+        elif hasattr(game.grid, "matrix") and game.width*game.height >= cls.vectorsize:
+            # Solve all lines at once on large NumPy backed boards
+            from nonogram.solver.vectorized import NonogramVectorSolver
+            NonogramVectorSolver.propagate(game, stats)
+        else:
+            cls.propagate(game, stats=stats)
+
+        if probing and any(None in row for row in game.rows):
+            from nonogram.solver.probing import NonogramProbeSolver
+            NonogramProbeSolver.propagate(game, stats)
+
+        if cls.issolved(game):
+            if __debug__ and tracing.info:
+                info(game, rule(title="Solving completed"))
+            if __debug__ and tracing.events:
+                event(INFO, "solved", solved=True)
+            return True
 
-        debug(game, Rule(title="Solving failed"))
+        if __debug__ and tracing.info:
+            info(game, rule(title="Solving failed"))
+        if __debug__ and tracing.events:
+            event(INFO, "solved", solved=False)
         return False
@@ -0,0 +1,127 @@
+"Cache for solved lines in Nonogram"
+
+import json
+from collections import OrderedDict
+
+from nonogram.solver.exceptions import UnsolvableLine
+
+
+class NonogramLineCache():
+    """Least recently used cache for line solving results
+
+    Keys consist of the line solver, the requirements and the line packed into
+    two bitmasks (filled and empty fields). Unsolvable lines are cached too."""
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    # Helpers
+
+    @classmethod
+    def pack(cls, values):
+        """Pack a line into bitmasks
+        Output format: (filled, empty)"""
+        filled = 0
+        empty = 0
+        for i, val in enumerate(values):
+            if val is True:
+                filled |= 1 << i
+            elif val is False:
+                empty |= 1 << i
+        return filled, empty
+
+    @classmethod
+    def unpack(cls, filled, empty, length):
+        "Unpack bitmasks into a line"
+        return [
+            True if filled >> i & 1 else False if empty >> i & 1 else None
+            for i in range(length)
+        ]
+
+    # Usage
+
+    def solve(self, linesolver, values, requirements):
+        "Solve a line with the given line solver or get the result from the cache"
+
+        if not self.enabled or not self.maxsize:
+            return linesolver.solve(values, requirements)
+
+        length = len(values)
+        filled, empty = self.solvebits(linesolver, *self.pack(values), requirements, length, values)
+        values[:] = self.unpack(filled, empty, length)
+        return values
+
+    def solvebits(self, linesolver, filled, empty, requirements, length, values=None):
+        """Solve a line packed into bitmasks or get the result from the cache
+        The line is only unpacked if it has to be solved. `values` can be passed
+        if the unpacked line is already known.
+        Output format: (filled, empty)"""
+
+        if not self.enabled or not self.maxsize:
+            if values is None:
+                values = self.unpack(filled, empty, length)
+            return self.pack(linesolver.solve(values, requirements))
+
+        if not isinstance(requirements, tuple):
+            requirements = tuple(requirements)
+        key = (linesolver.__name__, requirements, length, filled, empty)
+        entries = self.__entries
+
+        if key in entries:
+            self.hits += 1
+            entries.move_to_end(key)
+            result = entries[key]
+            if result is None:
+                raise UnsolvableLine("Requirements can't be placed in this line! "
+                                     f"{self.unpack(filled, empty, length)} {requirements}")
+            return result
+
+        self.misses += 1
+        if values is None:
+            values = self.unpack(filled, empty, length)
+        try:
+            result = entries[key] = self.pack(linesolver.solve(values, requirements))
+        except UnsolvableLine:
+            entries[key] = None
+            raise
+        finally:
+            while len(entries) > self.maxsize:
+                entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        "Remove all entries and reset the counters"
+        self.__entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    # Persistence
+
+    def save(self, path):
+        "Save all entries to a JSON file"
+        data = []
+        for (name, requirements, length, filled, empty), result in self.__entries.items():
+            data.append([[name, list(requirements), length, filled, empty], result])
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(data, file)
+
+    def load(self, path):
+        "Load entries from a JSON file created with `save`"
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        for key, result in data:
+            name, requirements, length, filled, empty = key
+            self.__entries[(name, tuple(requirements), length, filled, empty)] = \
+                None if result is None else tuple(result)
+        while len(self.__entries) > self.maxsize:
+            self.__entries.popitem(last=False)
+
+
+linecache = NonogramLineCache()
@@ -0,0 +1,59 @@
+"Requirements of Nonogram lines with precomputed metadata"
+
+
+class NonogramClue(tuple):
+    """Immutable requirements of a line of a given length
+
+    Behaves like a tuple of block lengths. Everything which only depends on the
+    requirements and the line length is computed once:
+
+    - total: Number of filled fields
+    - fullwidth: Minimal space needed for all blocks
+    - slack: Free space if all blocks are packed together
+    - prefix: prefix[j] is the sum of the first j blocks
+    - minstarts / maxstarts: Leftmost and rightmost start of each block in an empty line
+
+    Use `NonogramClue.get` to get interned instances."""
+
+    _interned = {}
+    _maxinterned = 100000
+
+    def __new__(cls, requirements, length):
+        clue = super().__new__(cls, requirements)
+        clue.length = length
+        clue.total = sum(clue)
+        clue.fullwidth = max(clue.total+len(clue)-1, 0)
+        clue.slack = length-clue.fullwidth
+
+        prefix = [0]
+        for req in clue:
+            prefix.append(prefix[-1]+req)
+        clue.prefix = tuple(prefix)
+        clue.minstarts = tuple(prefix[j]+j for j in range(len(clue)))
+        clue.maxstarts = tuple(start+clue.slack for start in clue.minstarts)
+        clue._reversed = None
+        return clue
+
+    def __reduce__(self):
+        # Only pickle the blocks, the metadata is computed again when interning
+        return (NonogramClue.get, (tuple(self), self.length))
+
+    @classmethod
+    def get(cls, requirements, length):
+        "Get the interned clue for requirements in a line of the given length"
+        if isinstance(requirements, cls) and requirements.length == length:
+            return requirements
+        key = (tuple(requirements), length)
+        clue = cls._interned.get(key)
+        if clue is None:
+            if len(cls._interned) >= cls._maxinterned:
+                cls._interned.clear()
+            clue = cls._interned[key] = cls(key[0], length)
+        return clue
+
+    @property
+    def reversed(self):
+        "Get the clue with the blocks in reverse order"
+        if self._reversed is None:
+            self._reversed = self.get(self[::-1], self.length)
+        return self._reversed
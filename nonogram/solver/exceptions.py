@@ -8,3 +8,7 @@ class UnsolvableState(NonogramException):
 
 class UnsolvableLine(UnsolvableState):
     pass
+
+
+class SearchLimitReached(NonogramException):
+    pass
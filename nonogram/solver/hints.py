@@ -0,0 +1,65 @@
+"Hints for Nonogram boards: the next fields deducible with the least work"
+
+import weakref
+
+from nonogram.solver.board import NonogramBoardSolver, ROW
+from nonogram.solver.cache import linecache
+from nonogram.solver.clues import NonogramClue
+from nonogram.solver.lines import NonogramLineSolver
+from nonogram.solver.settle import NonogramSettleSolver
+
+
+class NonogramHintSolver():
+    "Class for finding the next deducible fields of a board"
+
+    # Strategies from the cheapest to the most expensive
+    linesolvers = (NonogramLineSolver, NonogramSettleSolver)
+
+    _indices = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def getindex(cls, game):
+        """Get the lines of a board ordered by how likely they give a cheap deduction
+        Lines with less slack have larger overlaps. The order only depends on the
+        requirements, so it is computed once per game."""
+        index = cls._indices.get(game)
+        if index is None:
+            lines = NonogramBoardSolver.getlines(game)
+            index = sorted(lines, key=lambda line: cls._getslack(game, line))
+            cls._indices[game] = index
+        return index
+
+    @classmethod
+    def _getslack(cls, game, line):
+        "Helper function: Get the slack of a line (the requirements may be plain tuples)"
+        axis, index = line
+        if axis == ROW:
+            return NonogramClue.get(game.xinfo[index], game.width).slack
+        return NonogramClue.get(game.yinfo[index], game.height).slack
+
+    @classmethod
+    def gethint(cls, game):
+        """Get the next fields deducible by a single line
+        Returns None if line logic can't deduce anything.
+        Output format: {"axis", "index", "strategy", "fields": [(col, row, value), ...]}"""
+
+        index = cls.getindex(game)
+        for linesolver in cls.linesolvers:
+            for line in index:
+                values, requirements = NonogramBoardSolver.getline(game, line)
+                if None not in values:
+                    continue
+                old = list(values)
+                values = linecache.solve(linesolver, values, requirements)
+                fields = [
+                    NonogramBoardSolver.getpos(line, i) + (val,)
+                    for i, val in enumerate(values) if val is not old[i]
+                ]
+                if fields:
+                    return {
+                        'axis': "row" if line[0] == ROW else "column",
+                        'index': line[1],
+                        'strategy': linesolver.strategy,
+                        'fields': fields,
+                    }
+        return None
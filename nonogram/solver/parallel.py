@@ -0,0 +1,147 @@
+"""Parallel line solving for single large Nonogram boards
+
+All columns (or all rows) of a board are independent of each other, so the
+dirty lines of one phase are solved at the same time by a pool of workers.
+The results are merged by the calling process in line order, which makes the
+outcome independent of the number of workers and of their timing."""
+
+import os
+import time
+
+from nonogram.grids import SharedGrid
+from nonogram.solver.board import NonogramBoardSolver, ROW, COL
+from nonogram.solver.cache import linecache
+from nonogram.solver.lines import NonogramLineSolver
+from nonogram.solver.settle import NonogramSettleSolver
+from nonogram.utils import debug, rule, tracing
+
+# Shared game a worker process is attached to: (block name, game)
+_attached = None
+
+
+def _getshared(name):
+    "Helper function: Attach to a shared game once per worker process"
+    global _attached
+    if _attached is None or _attached[0] != name:
+        from nonogram.game import NonogramGame
+
+        if _attached is not None:
+            _attached[1].grid.close()
+        _attached = (name, NonogramGame.fromshared(name))
+    return _attached[1]
+
+
+def _solvesharedlines(name, axis, indices):
+    "Helper function: Solve lines of a shared game (runs in a worker process)"
+    return NonogramParallelSolver.solvelines(_getshared(name), axis, indices)
+
+
+class NonogramParallelSolver():
+    "Class for solving the lines of one board on several processes or threads"
+
+    # Name of this solver in statistics
+    strategy = "parallel"
+
+    # Helpers
+
+    @classmethod
+    def getbatches(cls, indices, count):
+        """Split line indices into up to `count` interleaved batches
+        Neighbouring lines are often similarly hard, so interleaving balances the work."""
+        return [indices[i::count] for i in range(min(count, len(indices)))]
+
+    @classmethod
+    def solvelines(cls, game, axis, indices, cached=True):
+        """Solve lines of a board without changing it
+        Lines are overlapped and then settled exactly.
+        Output format: [(index, [(i, value), ...], seconds), ...]"""
+        results = []
+        for index in indices:
+            start = time.perf_counter()
+            values, requirements = NonogramBoardSolver.getline(game, (axis, index))
+            old = list(values)
+            for linesolver in (NonogramLineSolver, NonogramSettleSolver):
+                if None not in values:
+                    break
+                values = linecache.solve(linesolver, values, requirements) if cached \
+                    else linesolver.solve(values, requirements)
+            changes = [(i, val) for i, val in enumerate(values) if val is not old[i]]
+            results.append((index, changes, time.perf_counter()-start))
+        return results
+
+    # Solving
+
+    @classmethod
+    def propagate(cls, game, workers=None, stats=None, executor=None, threads=False):
+        """Solve all dirty columns at once, then all dirty rows, until nothing changes
+
+        Worker processes read the board from a shared memory copy (see
+        `NonogramGame.toshared`). With `threads`, the lines are solved by threads
+        on the game itself instead, which only runs in parallel on free-threaded
+        CPython. An existing `executor` of the right kind can be passed to avoid
+        starting new workers.
+        Returns the list of changed fields as (col, row)."""
+
+        workers = workers or os.cpu_count() or 1
+        if executor is None:
+            # Imported here as multiprocessing is slow to import
+            from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+            pool = ThreadPoolExecutor if threads else ProcessPoolExecutor
+            with pool(max_workers=workers) as executor:
+                return cls.propagate(game, workers, stats, executor, threads)
+
+        if stats is not None:
+            stats.propagations += 1
+            with stats.phase("parallel"):
+                return cls._propagate(game, workers, stats, executor, threads)
+        return cls._propagate(game, workers, None, executor, threads)
+
+    @classmethod
+    def _propagate(cls, game, workers, stats, executor, threads):
+        # Shared games can be used directly if their block holds the requirements
+        if threads or isinstance(game.grid, SharedGrid) and game.grid.getclues() is not None:
+            shared = game
+        else:
+            shared = game.toshared()
+        dirty = {COL: set(range(game.width)), ROW: set(range(game.height))}
+        changed = []
+
+        try:
+            while dirty[COL] or dirty[ROW]:
+                for axis in (COL, ROW):
+                    indices = sorted(dirty[axis])
+                    if not indices:
+                        continue
+                    dirty[axis] = set()
+                    if __debug__ and tracing.debug:
+                        debug(rule(f"Solve {len(indices)} {'rows' if axis == ROW else 'columns'}"))
+
+                    batches = cls.getbatches(indices, workers)
+                    if threads:
+                        futures = [executor.submit(cls.solvelines, game, axis, batch, False)
+                                   for batch in batches]
+                    else:
+                        futures = [executor.submit(_solvesharedlines, shared.grid.name, axis, batch)
+                                   for batch in batches]
+                    results = [result for future in futures for result in future.result()]
+                    results.sort(key=lambda result: result[0])
+
+                    for index, changes, seconds in results:
+                        line = (axis, index)
+                        for i, val in changes:
+                            pos = NonogramBoardSolver.getpos(line, i)
+                            game[pos] = val
+                            if shared is not game:
+                                shared[pos] = val
+                            changed.append(pos)
+                            dirty[1-axis].add(i)
+                        if stats is not None:
+                            stats.addline(line, cls.strategy, len(changes), seconds)
+                    if stats is not None:
+                        stats.sweeps += 1
+        finally:
+            if shared is not game:
+                shared.grid.close()
+
+        return changed
@@ -0,0 +1,132 @@
+"Contradiction probing for Nonogram boards where line logic gets stuck"
+
+from nonogram.solver.board import NonogramBoardSolver, ROW, COL
+from nonogram.solver.exceptions import UnsolvableState
+from nonogram.utils import DEBUG, debug, event, tracing
+
+
+class NonogramProbeSolver:
+    """Class for deducing fields by probing both values of unknown fields
+
+    A probe sets a field, propagates line logic and undoes everything again.
+    If one value leads to a contradiction, the field has the other value.
+    Fields on which both probes agree are known as well."""
+
+    # Helpers
+
+    @classmethod
+    def getprobefields(cls, game):
+        """Get all unknown fields, those in lines with the fewest unknown fields first
+        Output format: [(col, row), ...]"""
+        rowcounts = [row.count(None) for row in game.rows]
+        colcounts = [col.count(None) for col in game.cols]
+        fields = [
+            (x, y)
+            for y in range(game.height) for x in range(game.width)
+            if game[x, y] is None
+        ]
+        fields.sort(key=lambda pos: min(rowcounts[pos[1]], colcounts[pos[0]]))
+        return fields
+
+    @classmethod
+    def _getlines(cls, fields):
+        "Helper function: Get the lines crossing the given fields"
+        lines = set()
+        for x, y in fields:
+            lines.add((ROW, y))
+            lines.add((COL, x))
+        return lines
+
+    @classmethod
+    def probe(cls, game, pos, value, stats=None):
+        """Set a field, propagate and undo everything again
+        Returns None if the value leads to a contradiction.
+        Output format: {(col, row): value, ...}"""
+        snapshot = game.snapshot()
+        game[pos] = value
+        try:
+            changed = NonogramBoardSolver.propagate(game, [(ROW, pos[1]), (COL, pos[0])], stats)
+            result = {field: game[field] for field in changed}
+            result[pos] = value
+            return result
+        except UnsolvableState:
+            return None
+        finally:
+            game.restore(snapshot)
+
+    # Solving
+
+    @classmethod
+    def propagate(cls, game, stats=None):
+        """Probe unknown fields and propagate the deduced fields until nothing changes
+
+        Probe results are cached together with the versions of the lines the
+        probe has read. Line logic is deterministic, so a probe is only run again
+        once one of these lines has changed. Raises UnsolvableState if both values
+        of a field lead to a contradiction.
+        Returns the list of changed fields as (col, row)."""
+
+        if stats is not None:
+            with stats.phase("probe"):
+                return cls._propagate(game, stats)
+        return cls._propagate(game, None)
+
+    @classmethod
+    def _propagate(cls, game, stats):
+        # Number of changes per line and cached probes: (pos, value) -> (result, versions)
+        versions = {}
+        cache = {}
+        changed = []
+
+        def apply(fields):
+            for field, val in fields.items():
+                game[field] = val
+            fields = list(fields)
+            fields += NonogramBoardSolver.propagate(game, cls._getlines(fields), stats)
+            for line in cls._getlines(fields):
+                versions[line] = versions.get(line, 0)+1
+            changed.extend(fields)
+
+        def getresult(pos, value):
+            cached = cache.get((pos, value))
+            if cached is not None:
+                result, readversions = cached
+                if all(versions.get(line, 0) == ver for line, ver in readversions.items()):
+                    return result
+            if stats is not None:
+                stats.probes += 1
+            result = cls.probe(game, pos, value, stats)
+            if result is not None:
+                readversions = {line: versions.get(line, 0) for line in cls._getlines(result)}
+                cache[pos, value] = (result, readversions)
+            return result
+
+        progress = True
+        while progress:
+            progress = False
+            for pos in cls.getprobefields(game):
+                if game[pos] is not None:
+                    continue
+
+                # A contradiction fixes the other value, propagating it raises
+                # UnsolvableState if that one is contradictory as well
+                filled = getresult(pos, True)
+                empty = getresult(pos, False) if filled is not None else None
+                if filled is None or empty is None:
+                    deduced = {pos: filled is not None}
+                else:
+                    deduced = {
+                        field: val for field, val in filled.items()
+                        if empty.get(field) is val
+                    }
+                    if not deduced:
+                        continue
+
+                if __debug__ and tracing.debug:
+                    debug("[yellow][Probing][/]", {"pos": pos, "deduced": deduced})
+                if __debug__ and tracing.events:
+                    event(DEBUG, "probe", pos=pos, deduced=len(deduced))
+                apply(deduced)
+                progress = True
+
+        return changed
@@ -0,0 +1,137 @@
+"Search solver for Nonogram boards which can't be solved by line logic alone"
+
+import time
+
+from nonogram.solver.board import NonogramBoardSolver, ROW, COL
+from nonogram.solver.exceptions import SearchLimitReached, UnsolvableState
+from nonogram.utils import DEBUG, debug, event, info, rule, tracing
+
+
+class NonogramSearchSolver:
+    "Class for solving nonogram boards by guessing fields and backtracking"
+
+    # Helpers
+
+    @classmethod
+    def getguess(cls, game):
+        """Get the field to guess next
+        The first unknown field of the line with the fewest unknown fields is used,
+        as filling it settles the most of that line.
+        Returns None if there are no unknown fields."""
+        best = None
+        bestcount = None
+        for y, row in enumerate(game.rows):
+            count = row.count(None)
+            if count and (bestcount is None or count < bestcount):
+                best = (row.index(None), y)
+                bestcount = count
+        for x, col in enumerate(game.cols):
+            count = col.count(None)
+            if count and (bestcount is None or count < bestcount):
+                best = (x, col.index(None))
+                bestcount = count
+        return best
+
+    # Solving
+
+    @classmethod
+    def itersolutions(cls, game, nodelimit=None, timelimit=None, stats=None):
+        """Search all solutions of the board by line logic and backtracking
+
+        Yields every time the game holds a solution. Guesses are undone with
+        copy-on-write snapshots and only lines crossing changed fields are
+        solved again. Once the search ends, the board is reset to the state after
+        the initial propagation. Raises SearchLimitReached after `nodelimit`
+        guesses or `timelimit` seconds."""
+
+        try:
+            NonogramBoardSolver.propagate(game, stats=stats)
+        except UnsolvableState:
+            return
+
+        root = game.snapshot()
+        deadline = None if timelimit is None else time.monotonic()+timelimit
+        nodes = 0
+        # Alternatives still to try: (snapshot, pos, value)
+        stack = []
+
+        while True:
+            pos = cls.getguess(game)
+            if pos is None:
+                if NonogramBoardSolver.issolved(game):
+                    yield
+                if not stack:
+                    game.restore(root)
+                    return
+                snapshot, pos, value = stack.pop()
+                game.restore(snapshot)
+            else:
+                stack.append((game.snapshot(), pos, False))
+                value = True
+
+            while True:
+                nodes += 1
+                if stats is not None:
+                    stats.nodes += 1
+                if (nodelimit is not None and nodes > nodelimit) or \
+                        (deadline is not None and time.monotonic() > deadline):
+                    game.restore(root)
+                    raise SearchLimitReached(f"Search stopped after {nodes-1} guesses")
+
+                if __debug__ and tracing.debug:
+                    debug(rule(f"Guess {pos} = {value} (node #{nodes})"))
+                if __debug__ and tracing.events:
+                    event(DEBUG, "guess", pos=pos, value=value, node=nodes)
+                game[pos] = value
+                try:
+                    NonogramBoardSolver.propagate(game, [(ROW, pos[1]), (COL, pos[0])], stats)
+                    break
+                except UnsolvableState:
+                    if not stack:
+                        game.restore(root)
+                        return
+                    snapshot, pos, value = stack.pop()
+                    game.restore(snapshot)
+
+    @classmethod
+    def solve(cls, game, nodelimit=None, timelimit=None, stats=None):
+        """Solve the board by line logic and backtracking
+        Returns False if the board has no solution or a limit has been reached"""
+
+        if stats is not None:
+            with stats.phase("search"):
+                return cls._solve(game, nodelimit, timelimit, stats)
+        return cls._solve(game, nodelimit, timelimit, None)
+
+    @classmethod
+    def _solve(cls, game, nodelimit, timelimit, stats):
+        try:
+            for _ in cls.itersolutions(game, nodelimit, timelimit, stats):
+                if __debug__ and tracing.info:
+                    info(game, rule(title="Solving completed"))
+                return True
+        except SearchLimitReached:
+            if __debug__ and tracing.info:
+                info(game, rule(title="Search limit reached"))
+            return False
+
+        if __debug__ and tracing.info:
+            info(game, rule(title="Solving failed"))
+        return False
+
+    @classmethod
+    def countsolutions(cls, game, limit=2, nodelimit=None, timelimit=None, stats=None):
+        """Count the solutions of the board, stopping as soon as `limit` are found
+        The board is left unchanged. Raises SearchLimitReached if the search
+        couldn't be finished within `nodelimit` guesses or `timelimit` seconds."""
+
+        snapshot = game.snapshot()
+        count = 0
+        try:
+            for _ in cls.itersolutions(game, nodelimit, timelimit, stats):
+                count += 1
+                if limit is not None and count >= limit:
+                    break
+        finally:
+            game.restore(snapshot)
+        return count
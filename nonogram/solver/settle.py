@@ -0,0 +1,162 @@
+"Exact line solver for Nonogram using dynamic programming"
+
+from nonogram.solver.clues import NonogramClue
+from nonogram.solver.exceptions import UnsolvableLine
+from nonogram.utils import debug, tracing
+
+
+class NonogramSettleSolver():
+    """Class for settling individual lines exactly
+
+    For every field it is checked whether it can be filled and whether it can be
+    empty in any valid placement of the requirements. Fields with only one
+    possibility are settled. This finds every field the line forces."""
+
+    # Name of this solver in statistics
+    strategy = "settle"
+
+    # Tables
+
+    @classmethod
+    def getblockedcount(cls, values):
+        """Get the prefix count of empty fields
+        Output format: [count in values[:0], count in values[:1], ...]"""
+        counts = [0]
+        for val in values:
+            counts.append(counts[-1]+(val is False))
+        return counts
+
+    @classmethod
+    def getprefixtable(cls, values, requirements, blocked):
+        """Get the prefix feasibility table
+        table[j][i] is True if values[:i] can hold exactly the first j requirements
+        requirements has to be a NonogramClue for the line"""
+        valwidth = len(values)
+        table = [[False]*(valwidth+1) for _ in range(len(requirements)+1)]
+
+        row = table[0]
+        row[0] = True
+        for i in range(1, valwidth+1):
+            row[i] = row[i-1] and values[i-1] is not True
+
+        for j, req in enumerate(requirements, start=1):
+            prev = table[j-1]
+            row = table[j]
+            # Block j-1 can't end before its leftmost end in an empty line
+            for i in range(requirements.minstarts[j-1]+req, valwidth+1):
+                # Field i-1 stays empty
+                if row[i-1] and values[i-1] is not True:
+                    row[i] = True
+                    continue
+                # Block j-1 ends at field i-1
+                start = i-req
+                if blocked[i] - blocked[start]:
+                    continue
+                if start == 0:
+                    row[i] = j == 1
+                elif values[start-1] is not True:
+                    row[i] = prev[start-1]
+        return table
+
+    @classmethod
+    def getsuffixtable(cls, values, requirements, blocked):
+        """Get the suffix feasibility table
+        table[j][i] is True if values[i:] can hold exactly the requirements from j on
+        requirements has to be a NonogramClue for the line"""
+        valwidth = len(values)
+        count = len(requirements)
+        table = [[False]*(valwidth+1) for _ in range(count+1)]
+
+        row = table[count]
+        row[valwidth] = True
+        for i in range(valwidth-1, -1, -1):
+            row[i] = row[i+1] and values[i] is not True
+
+        for j in range(count-1, -1, -1):
+            req = requirements[j]
+            nxt = table[j+1]
+            row = table[j]
+            # Block j can't start after its rightmost start in an empty line
+            for i in range(min(requirements.maxstarts[j], valwidth-req), -1, -1):
+                # Field i stays empty
+                if row[i+1] and values[i] is not True:
+                    row[i] = True
+                    continue
+                # Block j starts at field i
+                end = i+req
+                if blocked[end] - blocked[i]:
+                    continue
+                if end == valwidth:
+                    row[i] = j == count-1
+                elif values[end] is not True:
+                    row[i] = nxt[end+1]
+        return table
+
+    # Solving
+
+    @classmethod
+    def getpossibilities(cls, values, requirements):
+        """Get which fields can be filled and which can be empty
+        Output format: (canfill, canempty)"""
+        requirements = NonogramClue.get(requirements, len(values))
+        valwidth = len(values)
+        count = len(requirements)
+        blocked = cls.getblockedcount(values)
+        prefix = cls.getprefixtable(values, requirements, blocked)
+        suffix = cls.getsuffixtable(values, requirements, blocked)
+
+        if not prefix[count][valwidth]:
+            raise UnsolvableLine("Requirements can't be placed in this line! "
+                                 f"{values} {requirements}")
+
+        canempty = [
+            values[i] is not True and any(
+                prefix[j][i] and suffix[j][i+1] for j in range(count+1)
+            )
+            for i in range(valwidth)
+        ]
+
+        # Mark every field covered by a valid block placement
+        coverage = [0]*(valwidth+1)
+        for j, req in enumerate(requirements):
+            left = prefix[j]
+            right = suffix[j+1]
+            for start in range(requirements.minstarts[j], requirements.maxstarts[j]+1):
+                end = start+req
+                if blocked[end] - blocked[start]:
+                    continue
+                if start == 0:
+                    if j:
+                        continue
+                elif values[start-1] is True or not left[start-1]:
+                    continue
+                if end == valwidth:
+                    if j != count-1:
+                        continue
+                elif values[end] is True or not right[end+1]:
+                    continue
+                coverage[start] += 1
+                coverage[end] -= 1
+
+        canfill = []
+        covered = 0
+        for i in range(valwidth):
+            covered += coverage[i]
+            canfill.append(covered > 0)
+
+        return canfill, canempty
+
+    @classmethod
+    def solve(cls, values, requirements):
+        "Settle all fields of a line which have only one possibility"
+
+        canfill, canempty = cls.getpossibilities(values, requirements)
+        for i, val in enumerate(values):
+            if val is None:
+                if not canempty[i]:
+                    values[i] = True
+                elif not canfill[i]:
+                    values[i] = False
+        if __debug__ and tracing.debug:
+            debug("[cyan][Return] Settled:[/]", values)
+        return values
@@ -0,0 +1,68 @@
+"Statistics about solving Nonogram boards"
+
+import time
+from contextlib import contextmanager
+
+
+class NonogramSolverStats():
+    """Statistics collected while solving a board
+
+    Pass an instance to `NonogramGame.solve(stats=...)`. `onlinesolve` is called
+    after every line solve as onlinesolve(line, strategy, changed, seconds) where
+    line is (axis, index) and changed is the number of deduced fields."""
+
+    def __init__(self, onlinesolve=None):
+        self.onlinesolve = onlinesolve
+        # Number of NonogramBoardSolver.propagate runs
+        self.propagations = 0
+        # Number of vectorized column or row sweeps
+        self.sweeps = 0
+        # Per strategy: line solves, deduced fields and seconds
+        self.linecalls = {}
+        self.deduced = {}
+        self.linetimes = {}
+        self.cachehits = 0
+        # Number of guesses in search mode
+        self.nodes = 0
+        # Number of probes run (not answered from the probe cache)
+        self.probes = 0
+        # Seconds spent per phase
+        self.times = {}
+
+    def addline(self, line, strategy, changed, seconds, cachehit=False):
+        "Record a line solve"
+        self.linecalls[strategy] = self.linecalls.get(strategy, 0)+1
+        self.deduced[strategy] = self.deduced.get(strategy, 0)+changed
+        self.linetimes[strategy] = self.linetimes.get(strategy, 0)+seconds
+        if cachehit:
+            self.cachehits += 1
+        if self.onlinesolve is not None:
+            self.onlinesolve(line, strategy, changed, seconds)
+
+    @contextmanager
+    def phase(self, name):
+        "Context manager adding the time spent inside it to a phase"
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.times[name] = self.times.get(name, 0)+time.perf_counter()-start
+
+    @property
+    def totallinecalls(self):
+        "Get the number of line solves of all strategies"
+        return sum(self.linecalls.values())
+
+    def export(self):
+        "Get all statistics as a dict"
+        return {
+            'propagations': self.propagations,
+            'sweeps': self.sweeps,
+            'linecalls': dict(self.linecalls),
+            'deduced': dict(self.deduced),
+            'linetimes': dict(self.linetimes),
+            'cachehits': self.cachehits,
+            'nodes': self.nodes,
+            'probes': self.probes,
+            'times': dict(self.times),
+        }
@@ -0,0 +1,317 @@
+"""Vectorized line solver for Nonogram using NumPy
+
+Lines are stored as int8 arrays with -1 for unknown, 0 for empty and 1 for
+filled fields. All lines of the same length are solved at once."""
+
+import numpy
+
+from nonogram.solver.board import ROW, COL
+from nonogram.solver.exceptions import UnsolvableLine
+from nonogram.utils import debug, rule, tracing
+
+UNKNOWN = -1
+EMPTY = 0
+FILLED = 1
+
+
+class NonogramVectorSolver():
+    "Class for solving many lines of the same length at once"
+
+    # Name of this solver in statistics
+    strategy = "vector"
+
+    # Helpers
+
+    @classmethod
+    def _gather(cls, table, index, default=False):
+        "Helper function: Get table[line, index[line, i]] or default where the index is invalid"
+        valid = (index >= 0) & (index < table.shape[1])
+        result = numpy.take_along_axis(table, numpy.clip(index, 0, table.shape[1]-1), axis=1)
+        return numpy.where(valid, result, default)
+
+    @classmethod
+    def getrequirements(cls, requirements):
+        """Get the requirements as a padded matrix
+        Output format: (lengths, counts)"""
+        counts = numpy.array([len(reqs) for reqs in requirements], dtype=numpy.intp)
+        lengths = numpy.zeros((len(requirements), max(counts, default=0)), dtype=numpy.intp)
+        for i, reqs in enumerate(requirements):
+            lengths[i, :len(reqs)] = reqs
+        return lengths, counts
+
+    @classmethod
+    def _reverse(cls, lengths, counts):
+        "Helper function: Get the requirements of every line in reverse order"
+        index = counts[:, None]-1-numpy.arange(lengths.shape[1])[None, :]
+        return numpy.where(index >= 0, cls._gather(lengths, index, 0), 0)
+
+    # Placements
+
+    @classmethod
+    def getleftbounds(cls, values, lengths, counts):
+        """Get a lower bound of the start of every block in every line
+        Every block is placed at the first position after the previous block
+        where it only covers unknown or filled fields and isn't directly preceded
+        or followed by a filled field. Filled fields left uncovered are ignored,
+        which keeps the placement a bound instead of the exact leftmost one.
+        Output format: (starts, placeable) with starts shaped like lengths"""
+
+        linecount, valwidth = values.shape
+        notfilled = values != FILLED
+        emptycount = numpy.zeros((linecount, valwidth+1), dtype=numpy.intp)
+        numpy.cumsum(values == EMPTY, axis=1, out=emptycount[:, 1:])
+        # Fields before the first and after the last field count as not filled
+        padded = numpy.ones((linecount, valwidth+2), dtype=bool)
+        padded[:, 1:-1] = notfilled
+
+        # nextfit[d][line, i]: first start from i on where a block of lengths
+        # unique[d] fits, valwidth+1 if there is none
+        unique, inverse = numpy.unique(lengths, return_inverse=True)
+        inverse = inverse.reshape(lengths.shape)
+        nextfit = numpy.full((len(unique), linecount, valwidth+2), valwidth+1, dtype=numpy.intp)
+        positions = numpy.arange(valwidth+1)[None, :]
+        for d, length in enumerate(unique.tolist()):
+            if not length or length > valwidth:
+                continue
+            count = valwidth+1-length
+            fits = (
+                (emptycount[:, length:]-emptycount[:, :count] == 0)
+                & padded[:, length+1:]
+                & padded[:, :count]
+            )
+            nextfit[d, :, :count] = numpy.minimum.accumulate(
+                numpy.where(fits, positions[:, :count], valwidth+1)[:, ::-1], axis=1)[:, ::-1]
+
+        lines = numpy.arange(linecount)
+        starts = numpy.zeros(lengths.shape, dtype=numpy.intp)
+        minstart = numpy.zeros(linecount, dtype=numpy.intp)
+        for j in range(lengths.shape[1]):
+            start = nextfit[inverse[:, j], lines, numpy.minimum(minstart, valwidth+1)]
+            active = j < counts
+            starts[:, j] = numpy.where(active, start, 0)
+            minstart = numpy.where(active, start+lengths[:, j]+1, minstart)
+        placeable = minstart <= valwidth+1
+        return starts, placeable
+
+    @classmethod
+    def getbounds(cls, values, lengths, counts):
+        """Get bounds of the leftmost and rightmost start of every block in every line
+        Output format: (left, right, placeable) with left and right shaped like lengths"""
+        valwidth = values.shape[1]
+        left, placeable = cls.getleftbounds(values, lengths, counts)
+        reverse = cls._reverse(lengths, counts)
+        ends, reverseplaceable = cls.getleftbounds(values[:, ::-1], reverse, counts)
+        right = numpy.where(reverse > 0, valwidth-ends-reverse, 0)
+        return left, cls._reverse(right, counts), placeable & reverseplaceable
+
+    # Solving
+
+    @classmethod
+    def overlaplines(cls, values, requirements):
+        """Overlap the leftmost and rightmost placements of many lines at once
+        Fields covered by a block in both placements are filled, fields no block
+        can reach are empty. This finds fewer fields than `getpossibilities` but
+        needs much less work.
+        Output format: values with the deduced fields set"""
+
+        linecount, valwidth = values.shape
+        lengths, counts = cls.getrequirements(requirements)
+        left, right, placeable = cls.getbounds(values, lengths, counts)
+        active = numpy.arange(lengths.shape[1])[None, :] < counts[:, None]
+        lines = numpy.broadcast_to(numpy.arange(linecount)[:, None]*(valwidth+1), lengths.shape)
+
+        def getcovered(starts, ends, where):
+            # Number of ranges [starts, ends) covering every field
+            size = linecount*(valwidth+1)
+            weights = where.ravel().astype(numpy.intp)
+            diff = numpy.bincount((lines+starts).ravel(), weights, size) \
+                - numpy.bincount((lines+ends).ravel(), weights, size)
+            return numpy.cumsum(diff.reshape(linecount, valwidth+1), axis=1)[:, :-1] > 0
+
+        def check(broken):
+            if broken.any():
+                line = int(numpy.argmax(broken))
+                raise UnsolvableLine("Requirements can't be placed in this line! "
+                                     f"{values[line].tolist()} {requirements[line]}")
+
+        # A block's leftmost start can't be after its rightmost start
+        check(~placeable | (active & (left > right)).any(axis=1))
+        mustfill = getcovered(right, left+lengths, active & (right < left+lengths))
+        reachable = getcovered(left, right+lengths, active)
+        check((mustfill & (values == EMPTY) | ~reachable & (values == FILLED)).any(axis=1))
+
+        unknown = values == UNKNOWN
+        result = values.copy()
+        result[unknown & mustfill] = FILLED
+        result[unknown & ~reachable] = EMPTY
+        return result
+
+
+    @classmethod
+    def getpossibilities(cls, values, requirements):
+        """Get which fields of every line can be filled and which can be empty
+        Output format: (canfill, canempty) as boolean matrices shaped like values"""
+
+        linecount, valwidth = values.shape
+        lengths, counts = cls.getrequirements(requirements)
+        blockcount = lengths.shape[1]
+
+        # Add an empty field on both ends so that every block has neighbours
+        padded = numpy.full((linecount, valwidth+2), EMPTY, dtype=numpy.int8)
+        padded[:, 1:-1] = values
+        width = valwidth+2
+        filled = padded == FILLED
+        notfilled = ~filled
+        positions = numpy.arange(width+1)[None, :]
+
+        emptycount = numpy.zeros((linecount, width+1), dtype=numpy.intp)
+        numpy.cumsum(padded == EMPTY, axis=1, out=emptycount[:, 1:])
+        filledcount = numpy.zeros((linecount, width+1), dtype=numpy.intp)
+        numpy.cumsum(filled, axis=1, out=filledcount[:, 1:])
+
+        # Last filled field before i and first filled field from i on
+        lastfilled = numpy.full((linecount, width+1), -1, dtype=numpy.intp)
+        lastfilled[:, 1:] = numpy.maximum.accumulate(
+            numpy.where(filled, positions[:, :-1], -1), axis=1)
+        nextfilled = numpy.full((linecount, width+1), width, dtype=numpy.intp)
+        nextfilled[:, :-1] = numpy.minimum.accumulate(
+            numpy.where(filled, positions[:, :-1], width)[:, ::-1], axis=1)[:, ::-1]
+
+        # prefix[j][line, i]: values[:i] can hold exactly the first j requirements
+        prefix = [filledcount == 0]
+        for j in range(blockcount):
+            length = lengths[:, j:j+1]
+            start = positions-length
+            ends = (
+                (emptycount-cls._gather(emptycount, start, -1) == 0)
+                & cls._gather(notfilled, start-1)
+                & cls._gather(prefix[j], start-1)
+            )
+            lastend = numpy.maximum.accumulate(numpy.where(ends, positions, -1), axis=1)
+            table = (lastend >= 0) & (lastend > lastfilled)
+            prefix.append(numpy.where((j < counts)[:, None], table, prefix[j]))
+
+        if not prefix[-1][:, width].all():
+            line = int(numpy.argmin(prefix[-1][:, width]))
+            raise UnsolvableLine("Requirements can't be placed in this line! "
+                                 f"{values[line].tolist()} {requirements[line]}")
+
+        # suffix[j][line, i]: values[i:] can hold exactly the requirements from j on
+        # starts[j][line, s]: block j can start at s with all later blocks fitting
+        base = filledcount[:, width:] - filledcount == 0
+        suffix = [base]*(blockcount+1)
+        starts = [None]*blockcount
+        for j in range(blockcount-1, -1, -1):
+            length = lengths[:, j:j+1]
+            end = positions+length
+            starts[j] = (
+                (cls._gather(emptycount, end, -1)-emptycount == 0)
+                & cls._gather(notfilled, end)
+                & cls._gather(suffix[j+1], end+1)
+            )
+            nextstart = numpy.minimum.accumulate(
+                numpy.where(starts[j], positions, width+1)[:, ::-1], axis=1)[:, ::-1]
+            table = (nextstart <= width) & (nextstart <= nextfilled)
+            suffix[j] = numpy.where((j < counts)[:, None], table, base)
+
+        canempty = numpy.zeros((linecount, width), dtype=bool)
+        for j in range(blockcount+1):
+            canempty |= prefix[j][:, :-1] & suffix[j][:, 1:]
+        canempty &= notfilled
+
+        canfill = numpy.zeros((linecount, width), dtype=bool)
+        cells = positions[:, :-1]
+        for j in range(blockcount):
+            length = lengths[:, j:j+1]
+            valid = (
+                starts[j][:, :-1]
+                & cls._gather(notfilled, cells-1)
+                & cls._gather(prefix[j], cells-1)
+                & (j < counts)[:, None]
+            )
+            # A field is covered if a valid block starts at most length-1 fields before it
+            validcount = numpy.zeros((linecount, width+1), dtype=numpy.intp)
+            numpy.cumsum(valid, axis=1, out=validcount[:, 1:])
+            canfill |= validcount[:, 1:]-cls._gather(validcount, cells+1-length, 0) > 0
+
+        return canfill[:, 1:-1], canempty[:, 1:-1]
+
+    @classmethod
+    def _addsweep(cls, stats, axis, indices, old, new):
+        "Helper function: Record a sweep in the statistics"
+        stats.sweeps += 1
+        changed = (old != new).sum(axis=1)
+        for index, count in zip(indices.tolist(), changed.tolist()):
+            stats.addline((axis, index), cls.strategy, count, 0)
+
+    @classmethod
+    def settlelines(cls, values, requirements):
+        "Settle all fields of many lines which have only one possibility"
+
+        canfill, canempty = cls.getpossibilities(values, requirements)
+        unknown = values == UNKNOWN
+        result = values.copy()
+        result[unknown & ~canempty] = FILLED
+        result[unknown & ~canfill] = EMPTY
+        return result
+
+    @classmethod
+    def solvelines(cls, values, requirements):
+        """Overlap many lines and settle only those which overlapping doesn't change
+        Output format: (result, settled) where settled marks the settled lines"""
+
+        result = cls.overlaplines(values, requirements)
+        settled = (result == values).all(axis=1) & (values == UNKNOWN).any(axis=1)
+        if settled.any():
+            indices = numpy.flatnonzero(settled)
+            result[indices] = cls.settlelines(values[indices], [requirements[i] for i in indices])
+        return result, settled
+
+    @classmethod
+    def propagate(cls, game, stats=None):
+        """Solve all columns, then all rows, until nothing changes anymore
+        Only lines crossing a changed field are solved again. Like in
+        NonogramBoardSolver.propagate, lines are overlapped until that makes no
+        more progress and only then settled exactly.
+        The game has to use the "numpy" backend."""
+
+        if stats is not None:
+            stats.propagations += 1
+            with stats.phase("vector"):
+                return cls._propagate(game, stats)
+        return cls._propagate(game, None)
+
+    @classmethod
+    def _propagate(cls, game, stats):
+
+        matrix = game.grid.matrix
+        dirtycols = numpy.ones(game.width, dtype=bool)
+        dirtyrows = numpy.ones(game.height, dtype=bool)
+
+        while dirtycols.any() or dirtyrows.any():
+            if dirtycols.any():
+                if __debug__ and tracing.debug:
+                    debug(rule(f"Solve {int(dirtycols.sum())} columns"))
+                indices = numpy.flatnonzero(dirtycols)
+                old = matrix[:, indices].T
+                new, settled = cls.solvelines(old, [game.yinfo[i] for i in indices])
+                matrix[:, indices] = new.T
+                dirtyrows |= (old != new).any(axis=0)
+                dirtycols[:] = False
+                # Overlapped lines which changed are overlapped again
+                dirtycols[indices[(old != new).any(axis=1) & ~settled]] = True
+                if stats is not None:
+                    cls._addsweep(stats, COL, indices, old, new)
+
+            if dirtyrows.any():
+                if __debug__ and tracing.debug:
+                    debug(rule(f"Solve {int(dirtyrows.sum())} rows"))
+                indices = numpy.flatnonzero(dirtyrows)
+                old = matrix[indices]
+                new, settled = cls.solvelines(old, [game.xinfo[i] for i in indices])
+                matrix[indices] = new
+                dirtycols |= (old != new).any(axis=0)
+                dirtyrows[:] = False
+                dirtyrows[indices[(old != new).any(axis=1) & ~settled]] = True
+                if stats is not None:
+                    cls._addsweep(stats, ROW, indices, old, new)
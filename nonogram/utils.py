@@ -1,6 +1,47 @@
 "Some random utils"
 
-from rich import print as rprint
+import json
+import time
+import types
+
+# Tracing
+
+DEBUG = 10
+INFO = 20
+OFF = 100
+
+
+class Tracing():
+    """Tracing state
+
+    Hot code checks the flags before building any message or event:
+
+        if __debug__ and tracing.debug:
+            debug(...)
+
+    With tracing off this only costs an attribute lookup, and running Python
+    with -O removes such checks completely."""
+
+    def __init__(self):
+        self.level = OFF
+        self.stream = None
+        self.eventlevel = OFF
+        self.debug = False
+        self.info = False
+        self.events = False
+
+    def configure(self, level=OFF, stream=None, eventlevel=DEBUG):
+        """Set the minimum level of printed messages and optionally a stream
+        which receives events from `eventlevel` on as JSON lines"""
+        self.level = level
+        self.stream = stream
+        self.eventlevel = eventlevel
+        self.debug = level <= DEBUG
+        self.info = level <= INFO
+        self.events = stream is not None and eventlevel < OFF
+
+
+tracing = Tracing()
 
 # Settings
 
@@ -12,19 +53,61 @@ _settings = {
 def setting(name, value):
     "Change a setting"
     _settings[name] = value
+    if name == "debug":
+        tracing.configure(DEBUG if value else OFF, tracing.stream, tracing.eventlevel)
 
 # Log
+# rich is only imported once something is printed, so that importing the
+# solver stays fast. Without rich, messages are printed as plain text.
+
+
+def _rprint(*args, **kwargs):
+    "Helper function: rich.print, imported on first use"
+    try:
+        from rich import print as rprint
+    except ImportError:
+        rprint = print
+    rprint(*args, **kwargs)
+
+
+def rule(title="", **kwargs):
+    "Shortcut for rich.rule.Rule, imported on first use"
+    try:
+        from rich.rule import Rule
+    except ImportError:
+        return f"{'-'*8} {title} {'-'*8}" if title else '-'*24
+    return Rule(title, **kwargs)
+
+
+def _evaluate(args):
+    "Helper function: Call functions to get lazily built messages"
+    return [arg() if isinstance(arg, types.FunctionType) else arg for arg in args]
 
 
 def debug(*args, **kwargs):
-    "Shortcut for rich.print but depends on 'debug' setting"
-    if _settings['debug']:
-        rprint(*args, **kwargs)
+    """Shortcut for rich.print but only if debug tracing is on
+    Functions as arguments are called to build the message lazily"""
+    if tracing.debug:
+        _rprint(*_evaluate(args), **kwargs)
+
+
+def info(*args, **kwargs):
+    """Shortcut for rich.print but only if info tracing is on
+    Functions as arguments are called to build the message lazily"""
+    if tracing.info:
+        _rprint(*_evaluate(args), **kwargs)
+
+
+def event(level, name, **fields):
+    "Write a structured event as a JSON line to the tracing stream"
+    if tracing.events and level >= tracing.eventlevel:
+        tracing.stream.write(json.dumps(
+            {"time": time.time(), "level": level, "event": name, **fields}, default=str)+"\n")
 
 
 def log(*args, **kwargs):
     "Shortcut for rich.print"
-    rprint(*args, **kwargs)
+    _rprint(*args, **kwargs)
 
 # Random stuff
 
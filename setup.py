@@ -7,6 +7,9 @@ setup(
         "rich>=10.2.2",
         "click>=7.1.2",
     ],
+    extras_require={
+        "numpy": ["numpy>=1.17"],
+    },
     entry_points='''
         [console_scripts]
         nonogram=nonogram.commands:main